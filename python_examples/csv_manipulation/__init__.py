@@ -15,13 +15,29 @@ If this program is used as a driver to an API which manipulates a CSV and POST d
 they may not be used to using the typical list numbering (first column = 0)
 
 ::Modules Used::
-Pandas since it is very good at reading, manipulating, and returning an organized CSV of small to medium size
+Pandas since it is very good at reading, manipulating, and returning an organized CSV of small to medium size.
+Files too large for memory are processed a chunk of rows at a time with stream_column_extract,
+and many files at once over a process pool with batch_column_extract.
 """
+import glob
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
 import pandas
 
 
 def get_dataframe_from_tab_delimited(input_file='inputs/tab_delimited_file',
-                                     preferred_encoding='utf-8'):
+                                     preferred_encoding='utf-8',
+                                     chunk_size=None,
+                                     dtype=None,
+                                     desired_columns=None,
+                                     use_column_names=False,
+                                     engine='python',
+                                     strip_whitespace=False):
     """
     A simple method to open the default file and return a pandas.DataFrame.
 
@@ -33,13 +49,74 @@ def get_dataframe_from_tab_delimited(input_file='inputs/tab_delimited_file',
 
     :param input_file: default .txt file located in the unzipped folder received in email.
     :param preferred_encoding: default utf-8 which my IDE is set to and prevents future ANSI encoding issues.
-    :return: a pandas.DataFrame object which may contain leading or trailing whitespace.
+    :param chunk_size: if set, the file is read lazily and an iterator of DataFrames of at most chunk_size rows is returned.
+    :param dtype: optional dtype or dictionary of dtypes by column name passed on to pandas.read_csv.
+    :param desired_columns: optional column names or column numbers (starting at 1) as in get_specific_columns.
+        Only these columns are converted and stored, in the order of the file. The other columns are skipped
+        by the parser, so parsing time and memory scale with the desired columns instead of the file width.
+    :param use_column_names: see get_specific_columns.
+    :param engine: the pandas.read_csv parser, 'python' (default) or the much faster 'c' or 'pyarrow' (if installed).
+        All of them split on the plain tab and parse the same values. 'pyarrow' can not read in chunks.
+    :param strip_whitespace: strip the leading and trailing whitespace of the text values, so the output needs no
+        separate strip_end_whitespace_from_dataframe call. This is the same strip_end_whitespace_from_dataframe pass
+        over the text columns, run on the whole DataFrame once it is parsed or on each chunk as it is read, so it
+        saves no work when the file is read at once: the speedup of a stripped read comes from engine='c'.
+    :return: a pandas.DataFrame object, or with chunk_size an iterator of DataFrames of at most chunk_size rows.
+        Text values may contain leading or trailing whitespace unless strip_whitespace is set.
     """
-    dataframe = pandas.read_csv(input_file, sep='\t', engine='python', encoding=preferred_encoding)
+    if engine == 'pyarrow' and chunk_size is not None:
+        raise ValueError("The 'pyarrow' engine reads the whole file at once, use 'c' or 'python' with chunk_size.")
+
+    usecols = None
+    if desired_columns is not None:
+        usecols = get_desired_column_names(get_column_names(input_file, preferred_encoding), desired_columns,
+                                           use_column_names=use_column_names)
+
+    dataframe = pandas.read_csv(input_file, sep='\t', engine=engine, encoding=preferred_encoding,
+                                chunksize=chunk_size, dtype=dtype, usecols=usecols)
+
+    if strip_whitespace:
+        if chunk_size is None:
+            dataframe = strip_end_whitespace_from_dataframe(dataframe)
+        else:
+            dataframe = StrippedChunks(dataframe)
 
     return dataframe
 
 
+class StrippedChunks:
+    """
+    Wraps the chunk iterator of pandas.read_csv to strip every chunk as it is read, and closes it the same way.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield strip_end_whitespace_from_dataframe(chunk)
+
+    def close(self):
+        self.chunks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_column_names(input_file='inputs/tab_delimited_file', preferred_encoding='utf-8'):
+    """
+    Reads only the header of a tab-delimited file.
+
+    :return: a list of the column names, as get_dataframe_from_tab_delimited names the columns.
+    """
+    header = pandas.read_csv(input_file, sep='\t', engine='python', encoding=preferred_encoding, nrows=0)
+
+    return header.columns.tolist()
+
+
 def strip_end_whitespace_from_dataframe(dataframe):
     """
     The method get_dataframe_from_tab_delimited(input_file, preferred_encoding) returns a dataframe which may contain
@@ -51,8 +128,9 @@ def strip_end_whitespace_from_dataframe(dataframe):
     :return: a copy of the input dataframe which is cleaned of leading and trailing whitespace.
     """
     # clean the leading and trailing whitespace in for all columns (pandas.Series) which have string types for all cells
+    # newer pandas reads text into the dedicated string dtype instead of object
     for column in dataframe.columns:
-        if dataframe[column].dtype == 'object':
+        if dataframe[column].dtype == 'object' or isinstance(dataframe[column].dtype, pandas.StringDtype):
             dataframe[column] = dataframe[column].str.strip()
 
     return dataframe
@@ -106,6 +184,28 @@ def get_specific_columns(dataframe, desired_columns, use_column_names=False):
     :return: a pandas.DataFrame object with only the desired columns.
     """
 
+    desired_columns_by_name = get_desired_column_names(dataframe.columns, desired_columns,
+                                                       use_column_names=use_column_names)
+
+    # data for the new DataFrame object to be returned
+    # formatted as a dictionary of Series objects
+    data = {desired_column_name: dataframe[desired_column_name] for desired_column_name in desired_columns_by_name}
+
+    dataframe_with_selected_columns = pandas.DataFrame(data=data)
+
+    return dataframe_with_selected_columns
+
+
+def get_desired_column_names(column_names, desired_columns, use_column_names=False):
+    """
+    Turns desired_columns, given by column name or by column number (starting at 1), into column names.
+    The rules are the ones described in get_specific_columns, which uses this method.
+
+    :param column_names: the sequence of column names of a dataframe or of a file's header.
+    :param desired_columns: a sequence type (not including string type) with column names OR column numbers (starting at 1).
+    :param use_column_names: a boolean type which allows the user to override if the dataframe provided refers to its columns by number.
+    :return: a list of the desired column names in the order of desired_columns.
+    """
     # Raise exception if the entered parameter desired_columns is not an iterable sequence
     if not hasattr(desired_columns, '__iter__') or type(desired_columns) is str:
         raise TypeError(f"Please enter an iterable sequence type for parameter desired_columns. "
@@ -117,32 +217,26 @@ def get_specific_columns(dataframe, desired_columns, use_column_names=False):
 
     if use_column_names:
         # raise exception if provided desired_column do not exist in provided dataframe
-        if any(desired_column_name not in dataframe.columns for desired_column_name in desired_columns):
+        if any(desired_column_name not in column_names for desired_column_name in desired_columns):
             raise KeyError(f"Sequence provided as desired_columns: "
                            f"{desired_columns} "
                            f"contain column names which are not in the provided dataframe. "
                            f"Valid column names are as follows: "
-                           f"{dataframe.columns.tolist()}")
+                           f"{list(column_names)}")
         desired_columns_by_name = desired_columns
     else:
         desired_columns_by_index = [desired_column_number - 1 for desired_column_number in desired_columns]
-        if any(desired_column_index > len(dataframe.columns)
+        if any(desired_column_index > len(column_names)
                for desired_column_index in desired_columns_by_index):
             raise KeyError(f"Sequence provided as desired_columns: "
                            f"{desired_columns} "
                            f"contain column numbers which are not in the provided dataframe. "
                            f"Valid column numbers are as follows: "
-                           f"{[i + 1 for i in range(len(dataframe.columns))]}")
-        desired_columns_by_name = [dataframe.columns[desired_column_index]
+                           f"{[i + 1 for i in range(len(column_names))]}")
+        desired_columns_by_name = [column_names[desired_column_index]
                                    for desired_column_index in desired_columns_by_index]
 
-    # data for the new DataFrame object to be returned
-    # formatted as a dictionary of Series objects
-    data = {desired_column_name: dataframe[desired_column_name] for desired_column_name in desired_columns_by_name}
-
-    dataframe_with_selected_columns = pandas.DataFrame(data=data)
-
-    return dataframe_with_selected_columns
+    return list(desired_columns_by_name)
 
 
 def set_first_column(dataframe, desired_first_column, use_column_names=False):
@@ -179,11 +273,321 @@ def set_first_column(dataframe, desired_first_column, use_column_names=False):
     return dataframe
 
 
+def is_copy_on_write_enabled():
+    """
+    :return: True if pandas' copy-on-write is on: always from pandas 3.0, opt-in with
+        pandas.options.mode.copy_on_write = True on pandas 2.x (its 'warn' mode does not count).
+    """
+    # the option is deprecated from pandas 3.0, reading it there only raises a warning
+    if int(pandas.__version__.split('.')[0]) >= 3:
+        return True
+    return getattr(pandas.options.mode, 'copy_on_write', False) is True
+
+
+def select_columns(dataframe, desired_columns, desired_first_column=None, use_column_names=False):
+    """
+    get_specific_columns and set_first_column in one step, without modifying the input dataframe.
+
+    The columns are addressed as in get_specific_columns and set_first_column: by name or by number (starting at 1),
+    desired_first_column counting the columns of the selection.
+
+    Whether the values are copied depends on the pandas version:
+        - copy-on-write on (pandas 3.0, or pandas 2.x with pandas.options.mode.copy_on_write = True): the result
+          shares the input's columns, so selecting 3 columns of a wide frame takes no memory for their values,
+          and a later write to either frame copies only the written column
+        - copy-on-write off (the pandas 2.x default): a frame built without copy would share its columns with the
+          input and writes would reach both, so the selected columns are copied
+        - pandas 1.x: copied as well, pandas consolidates the columns into one block anyway
+
+    :param dataframe: a pandas.DataFrame object with defined columns.
+    :param desired_columns: a sequence type (not including string type) with column names OR column numbers (starting at 1).
+    :param desired_first_column: optional column name or column number (starting at 1) of the selection to move first.
+    :param use_column_names: a boolean type which allows the user to override if the dataframe provided refers to its columns by number.
+    :return: a pandas.DataFrame object with only the desired columns, desired_first_column first.
+    """
+    # a column asked for twice is kept once, as in get_specific_columns
+    desired_columns_by_name = list(dict.fromkeys(get_desired_column_names(dataframe.columns, desired_columns,
+                                                                          use_column_names=use_column_names)))
+
+    if desired_first_column is not None:
+        if type(desired_first_column) is not int or use_column_names:
+            first_column_name = desired_first_column
+        else:
+            first_column_name = desired_columns_by_name[desired_first_column - 1]
+        if first_column_name not in desired_columns_by_name:
+            raise KeyError(f"desired_first_column {desired_first_column} is not one of the desired_columns: "
+                           f"{desired_columns_by_name}")
+        desired_columns_by_name.remove(first_column_name)
+        desired_columns_by_name.insert(0, first_column_name)
+
+    # every column of a DataFrame is a view of its data, a frame of them with copy=False copies nothing,
+    # which is only safe when copy-on-write keeps a write to one frame from reaching the other
+    dataframe_with_selected_columns = pandas.DataFrame(
+        data={desired_column_name: dataframe[desired_column_name] for desired_column_name in desired_columns_by_name},
+        copy=not is_copy_on_write_enabled())
+
+    return dataframe_with_selected_columns
+
+
+def column_extract(dataframe, desired_columns, desired_first_column, use_column_names=False):
+    """
+    The whole manipulation of this task on one DataFrame: strip the whitespace, keep the desired columns
+    and re-order them so desired_first_column is first.
+
+    :param dataframe: a pandas.DataFrame object usually produced by get_dataframe_from_tab_delimited().
+    :param desired_columns: see select_columns.
+    :param desired_first_column: see select_columns, numbers refer to the columns after the selection.
+    :param use_column_names: see select_columns.
+    :return: the extracted pandas.DataFrame object.
+    """
+    dataframe = strip_end_whitespace_from_dataframe(dataframe)
+    dataframe = select_columns(dataframe, desired_columns, desired_first_column, use_column_names=use_column_names)
+
+    return dataframe
+
+
+def combine_chunk_dtypes(chunk_dtypes):
+    """
+    pandas infers the dtype of every chunk on its own, so a column may be int64 in one chunk and float64 (it has a
+    missing value) or text in another. This method returns the dtype pandas would have inferred reading the file at once.
+
+    :param chunk_dtypes: the dtypes one column was given in every chunk.
+    :return: the dtype of the column as if the whole file was read at once.
+    """
+    unique_dtypes = list(dict.fromkeys(chunk_dtypes))
+    if len(unique_dtypes) == 1:
+        return unique_dtypes[0]
+
+    def is_number(dtype):
+        return pandas.api.types.is_numeric_dtype(dtype) and not pandas.api.types.is_bool_dtype(dtype)
+
+    if all(is_number(dtype) for dtype in unique_dtypes):
+        return pandas.api.types.pandas_dtype(numpy.result_type(*unique_dtypes))
+    # a column with any text is kept as text for the whole file
+    text_dtypes = [dtype for dtype in unique_dtypes if not is_number(dtype) and not pandas.api.types.is_bool_dtype(dtype)]
+    return text_dtypes[0] if text_dtypes else numpy.dtype('object')
+
+
+def infer_dtypes_by_chunk(input_file, preferred_encoding='utf-8', chunk_size=100000, desired_columns=None,
+                          engine='python'):
+    """
+    Reads the file a chunk at a time to find the dtype of every column as if it was read at once.
+
+    :param desired_columns: optional column names, only these columns are parsed.
+    :param engine: see get_dataframe_from_tab_delimited.
+    :return: a dictionary of dtypes by column name.
+    """
+    dtypes_by_column = {}
+    with get_dataframe_from_tab_delimited(input_file, preferred_encoding, chunk_size=chunk_size,
+                                          desired_columns=desired_columns, engine=engine) as chunks:
+        for chunk in chunks:
+            for column, dtype in chunk.dtypes.items():
+                dtypes_by_column.setdefault(column, []).append(dtype)
+
+    return {column: combine_chunk_dtypes(chunk_dtypes) for column, chunk_dtypes in dtypes_by_column.items()}
+
+
+def stream_column_extract(input_file, output_file, desired_columns, desired_first_column, use_column_names=False,
+                          preferred_encoding='utf-8', chunk_size=100000, engine='python'):
+    """
+    The streaming equivalent of reading the file with get_dataframe_from_tab_delimited, calling column_extract
+    and writing the result with to_csv(output_file, index=False): the output is byte-identical,
+    but only chunk_size rows are held in memory at a time.
+
+    The file is read twice. The first pass finds the dtype every column would get if the file was read at once,
+    the second reads every chunk with those dtypes so no chunk formats its numbers differently (e.g. 5 vs 5.0).
+    Both passes only parse the desired columns.
+
+    :param input_file: tab-delimited text file to read.
+    :param output_file: CSV file to write.
+    :param desired_columns: see get_specific_columns.
+    :param desired_first_column: see set_first_column.
+    :param use_column_names: passed to both get_specific_columns and set_first_column.
+    :param preferred_encoding: encoding of both the input and the output file.
+    :param chunk_size: number of rows read, manipulated and written at a time.
+    :param engine: 'python' (default) or 'c', which is much faster and gives the same output.
+        'pyarrow' can not read in chunks and is not supported.
+    :return: the number of rows written.
+    """
+    if engine not in ('python', 'c'):
+        raise ValueError(f"Unknown engine: {engine}. Valid engines are 'python' and 'c'")
+
+    desired_column_names = get_desired_column_names(get_column_names(input_file, preferred_encoding), desired_columns,
+                                                    use_column_names=use_column_names)
+    dtypes = infer_dtypes_by_chunk(input_file, preferred_encoding, chunk_size=chunk_size,
+                                   desired_columns=desired_column_names, engine=engine)
+
+    row_count = 0
+    header_written = False
+    # newline='' as pandas opens the file itself when given a path
+    with open(output_file, 'w', encoding=preferred_encoding, newline='') as output, \
+            get_dataframe_from_tab_delimited(input_file, preferred_encoding, chunk_size=chunk_size, dtype=dtypes or None,
+                                             desired_columns=desired_column_names, engine=engine) as chunks:
+        for chunk in chunks:
+            chunk_out = column_extract(chunk, desired_column_names, desired_first_column,
+                                       use_column_names=use_column_names)
+            chunk_out.to_csv(output, index=False, header=not header_written)
+            header_written = True
+            row_count += len(chunk_out)
+
+        if not header_written:
+            # a file without rows still gets the header of the selected columns
+            empty_dataframe = get_dataframe_from_tab_delimited(input_file, preferred_encoding, dtype=dtypes or None,
+                                                               desired_columns=desired_column_names, engine=engine)
+            column_extract(empty_dataframe, desired_column_names, desired_first_column,
+                           use_column_names=use_column_names).to_csv(output, index=False)
+
+    return row_count
+
+
+def list_input_files(input_files):
+    """
+    :param input_files: a directory (every file directly in it), a glob pattern or a sequence of paths.
+    :return: the sorted list of input file paths.
+    :raise FileNotFoundError: if no input file matches, e.g. a missing directory or a mistyped pattern.
+    """
+    if not isinstance(input_files, str):
+        input_file_list = list(input_files)
+    elif os.path.isdir(input_files):
+        input_file_list = sorted(os.path.join(input_files, file_name) for file_name in os.listdir(input_files)
+                                 if not file_name.startswith('.') and
+                                 os.path.isfile(os.path.join(input_files, file_name)))
+    else:
+        input_file_list = sorted(glob.glob(input_files))
+
+    if not input_file_list:
+        raise FileNotFoundError(f"No input files match {input_files}")
+    return input_file_list
+
+
+def extract_file(input_file, output_file, desired_columns, desired_first_column, use_column_names=False,
+                 preferred_encoding='utf-8', chunk_size=100000, engine='c'):
+    """
+    Runs stream_column_extract on one file for batch_column_extract. It never raises: a failure is reported in
+    the result and leaves no partial output, since the output is only moved to output_file once it is complete.
+
+    :return: a result dictionary with the input_file, output_file, rows, input_bytes, seconds and error (None if it succeeded).
+    """
+    start = time.perf_counter()
+    result = {'input_file': input_file, 'output_file': output_file, 'rows': None, 'input_bytes': None,
+              'seconds': None, 'error': None}
+    temporary_output_file = f'{output_file}.tmp'
+    try:
+        result['input_bytes'] = os.path.getsize(input_file)
+        result['rows'] = stream_column_extract(input_file, temporary_output_file, desired_columns, desired_first_column,
+                                               use_column_names=use_column_names,
+                                               preferred_encoding=preferred_encoding, chunk_size=chunk_size,
+                                               engine=engine)
+        os.replace(temporary_output_file, output_file)
+    except Exception as error:
+        result['error'] = f'{type(error).__name__}: {error}'
+        if os.path.exists(temporary_output_file):
+            os.remove(temporary_output_file)
+    result['seconds'] = time.perf_counter() - start
+
+    return result
+
+
+def merge_csv_files(csv_files, merged_output_file, preferred_encoding='utf-8'):
+    """
+    Concatenates CSV files written by stream_column_extract, keeping the header of the first one.
+
+    :return: a dictionary {csv file: error} of the files left out because their header differs from the first one's.
+    """
+    skipped_files = {}
+    header = None
+    with open(merged_output_file, 'w', encoding=preferred_encoding, newline='') as merged_output:
+        for csv_file in csv_files:
+            with open(csv_file, 'r', encoding=preferred_encoding, newline='') as csv_input:
+                csv_header = csv_input.readline()
+                if header is None:
+                    header = csv_header
+                    merged_output.write(header)
+                elif csv_header != header:
+                    skipped_files[csv_file] = f'its columns {csv_header.strip()} differ from {header.strip()}'
+                    continue
+                shutil.copyfileobj(csv_input, merged_output)
+
+    return skipped_files
+
+
+def batch_column_extract(input_files, desired_columns, desired_first_column, output_directory=None,
+                         merged_output_file=None, use_column_names=False, preferred_encoding='utf-8',
+                         chunk_size=100000, engine='c', max_workers=None):
+    """
+    Runs the column extract of stream_column_extract on many files at once, one file per process of a pool.
+
+    Either output_directory or merged_output_file must be given:
+        - output_directory: one CSV per input file, named after the input file with a .csv extension
+        - merged_output_file: a single CSV with the rows of every input file in the order of the input files,
+          each file's values formatted as its own extract would format them
+
+    A file which fails (missing columns, unreadable, ...) is reported and left out, the batch carries on.
+
+    :param input_files: a directory, a glob pattern or a sequence of paths, see list_input_files.
+    :param desired_columns: see get_specific_columns.
+    :param desired_first_column: see set_first_column.
+    :param max_workers: number of processes, default os.cpu_count().
+    :return: a list of result dictionaries (see extract_file) in the order of the input files,
+        with rows_per_second and megabytes_per_second added.
+    :raise FileNotFoundError: if no input file matches input_files.
+    """
+    if (output_directory is None) == (merged_output_file is None):
+        raise ValueError("Please provide either output_directory or merged_output_file.")
+
+    input_file_list = list_input_files(input_files)
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        if output_directory is not None:
+            os.makedirs(output_directory, exist_ok=True)
+            output_files = [os.path.join(output_directory, os.path.splitext(os.path.basename(input_file))[0] + '.csv')
+                            for input_file in input_file_list]
+            if len(set(output_files)) < len(output_files):
+                raise ValueError("Several input files share a file name, their outputs would overwrite each other.")
+        else:
+            output_files = [os.path.join(temporary_directory, f'part_{file_number}.csv')
+                            for file_number in range(len(input_file_list))]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(extract_file, input_file, output_file, desired_columns, desired_first_column,
+                                       use_column_names=use_column_names, preferred_encoding=preferred_encoding,
+                                       chunk_size=chunk_size, engine=engine)
+                       for input_file, output_file in zip(input_file_list, output_files)]
+            results = []
+            for input_file, output_file, future in zip(input_file_list, output_files, futures):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    # the worker process itself died, e.g. out of memory
+                    results.append({'input_file': input_file, 'output_file': output_file, 'rows': None,
+                                    'input_bytes': None, 'seconds': None,
+                                    'error': f'{type(error).__name__}: {error}'})
+
+        if merged_output_file is not None:
+            skipped_files = merge_csv_files([result['output_file'] for result in results if result['error'] is None],
+                                            merged_output_file, preferred_encoding=preferred_encoding)
+            for result, output_file in zip(results, output_files):
+                if output_file in skipped_files:
+                    result['error'] = skipped_files[output_file]
+                result['output_file'] = merged_output_file if result['error'] is None else None
+
+    for result in results:
+        succeeded = result['error'] is None and result['seconds']
+        result['rows_per_second'] = result['rows'] / result['seconds'] if succeeded else None
+        result['megabytes_per_second'] = result['input_bytes'] / 2 ** 20 / result['seconds'] if succeeded else None
+
+    return results
+
+
 if __name__ == "__main__":
     # Read the provided CSV and strip whitespace:
-    # Using built in pandas.read_csv()
-    df = get_dataframe_from_tab_delimited(input_file='inputs/tab_delimited_file', preferred_encoding='utf-8')
+    # Using built in pandas.read_csv(), only parsing the columns needed for the output
+    df = get_dataframe_from_tab_delimited(input_file='inputs/tab_delimited_file', preferred_encoding='utf-8',
+                                          desired_columns=['FirstName', 'ActionID', 'PreferredEmail'])
     df = strip_end_whitespace_from_dataframe(df)
+    # ALTERNATIVE: Using the C parser of pandas.read_csv(), stripping the whitespace while reading (much faster on large files)
+    # df = get_dataframe_from_tab_delimited(input_file='inputs/tab_delimited_file', preferred_encoding='utf-8',
+    #                                       desired_columns=['FirstName', 'ActionID', 'PreferredEmail'],
+    #                                       engine='c', strip_whitespace=True)
     # ALTERNATIVE: Using regex instead of builtin pandas method
     # df = get_dataframe_using_regex(input_file='inputs/tab_delimited_file',
     #                                separator_regular_expression=r'\t|\s{2,}',
@@ -192,7 +596,7 @@ if __name__ == "__main__":
     # Get desired columns (ordered by input parameters) using either column number (first column = 1) or column name
     # Using column names
     df_out = get_specific_columns(df, desired_columns=['FirstName', 'ActionID', 'PreferredEmail'])
-    # ALTERNATIVE: Using column numbers (first column = 1)
+    # ALTERNATIVE: Using column numbers (first column = 1) of a dataframe read without desired_columns
     # df_out = get_specific_columns(dataframe=df, desired_columns=[4, 2, 6])
 
     # Re-order columns for output by setting the first column
@@ -200,6 +604,13 @@ if __name__ == "__main__":
     df_out = set_first_column(df_out, 2, use_column_names=False)
     # ALTERNATIVE: # Using column name for desired first column
     # df_out = set_first_column(df_out, 'ActionID')
+    # ALTERNATIVE: select and re-order in one step, without modifying df (no copy under copy-on-write, see select_columns)
+    # df_out = select_columns(df, desired_columns=['FirstName', 'ActionID', 'PreferredEmail'], desired_first_column=2)
 
     # Write the output csv in the /outputs directory
     df_out.to_csv('outputs/example_output.csv', index=False, encoding='utf-8')
+
+    # ALTERNATIVE: for files too large for memory, the same read, strip, select and re-order a chunk of rows at a time
+    # stream_column_extract(input_file='inputs/tab_delimited_file', output_file='outputs/example_output.csv',
+    #                       desired_columns=['FirstName', 'ActionID', 'PreferredEmail'], desired_first_column=2,
+    #                       chunk_size=100000)
@@ -0,0 +1,60 @@
+"""
+The batch entry point of csv_manipulation: the same column extract and re-order as the __main__ example,
+for every tab-delimited file of a directory or glob pattern, fanned out over a process pool.
+Prints the throughput of every file and the failures, a failed file never stops the others.
+Exits with status 1 if any file failed.
+
+Run from the python_examples directory, e.g. one output per input:
+    python -m csv_manipulation.batch 'drops/*.txt' --output-directory outputs/drops
+or one merged output, with columns by number (first column = 1):
+    python -m csv_manipulation.batch drops --merged-output-file outputs/drops.csv --columns 4 2 6 --first-column 2
+"""
+import argparse
+import sys
+
+from . import batch_column_extract
+
+
+def parse_column(column):
+    # column numbers are given as digits, anything else is a column name
+    return int(column) if column.isdigit() else column
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_files', help='a directory or a glob pattern of tab-delimited files')
+    outputs = parser.add_mutually_exclusive_group(required=True)
+    outputs.add_argument('--output-directory', help='write one CSV per input file to this directory')
+    outputs.add_argument('--merged-output-file', help='write the rows of every input file to this CSV')
+    parser.add_argument('--columns', nargs='+', type=parse_column, default=['FirstName', 'ActionID', 'PreferredEmail'])
+    parser.add_argument('--first-column', type=parse_column, default=2)
+    parser.add_argument('--use-column-names', action='store_true',
+                        help='treat columns given as digits as column names')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--engine', choices=['c', 'python'], default='c')
+    parser.add_argument('--max-workers', type=int, default=None)
+    arguments = parser.parse_args()
+
+    try:
+        results = batch_column_extract(arguments.input_files, arguments.columns, arguments.first_column,
+                                       output_directory=arguments.output_directory,
+                                       merged_output_file=arguments.merged_output_file,
+                                       use_column_names=arguments.use_column_names,
+                                       preferred_encoding=arguments.encoding, chunk_size=arguments.chunk_size,
+                                       engine=arguments.engine, max_workers=arguments.max_workers)
+    except FileNotFoundError as error:
+        # a missing directory or a mistyped pattern is an error, not an empty batch
+        parser.error(str(error))
+
+    for result in results:
+        if result['error'] is None:
+            print(f"ok     {result['input_file']}: {result['rows']} rows in {result['seconds']:.3f} s "
+                  f"({result['rows_per_second']:.0f} rows/s, {result['megabytes_per_second']:.1f} MB/s)")
+        else:
+            print(f"failed {result['input_file']}: {result['error']}")
+
+    failed_count = sum(1 for result in results if result['error'] is not None)
+    print(f'{len(results) - failed_count} of {len(results)} files extracted')
+    if failed_count:
+        sys.exit(1)
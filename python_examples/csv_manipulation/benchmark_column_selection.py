@@ -0,0 +1,83 @@
+"""
+A memory benchmark of selecting and re-ordering columns of a wide DataFrame, comparing
+get_specific_columns followed by set_first_column with select_columns.
+
+For each method the peak allocation (tracemalloc, which numpy reports its arrays to) is measured,
+and every selected column is checked to share or not share its data with the input frame.
+The input frame is checked to be left unmodified.
+
+Run from the python_examples directory:
+    python -m csv_manipulation.benchmark_column_selection --rows 1000000 --columns 50
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy
+import pandas
+
+from . import get_specific_columns, select_columns, set_first_column
+
+
+def make_wide_dataframe(row_count, column_count, seed=0):
+    # one float block, as pandas stores a wide numeric frame, plus a text column
+    random_generator = numpy.random.default_rng(seed)
+    dataframe = pandas.DataFrame(random_generator.random((row_count, column_count)),
+                                 columns=[f'column_{column_number}' for column_number in range(1, column_count + 1)])
+    dataframe['text'] = numpy.where(random_generator.random(row_count) < 0.5, 'Steele', 'James')
+    return dataframe
+
+
+def measure(selection_function):
+    """
+    :return: a tuple (result, seconds, peak_bytes).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = selection_function()
+    seconds = time.perf_counter() - start
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak_bytes
+
+
+def run_benchmark(row_count, column_count, desired_columns=(4, 2, 6), desired_first_column=2):
+    """
+    :return: a list of result dictionaries, one per method.
+    """
+    dataframe = make_wide_dataframe(row_count, column_count)
+    input_columns = dataframe.columns.tolist()
+    methods = {'get_specific_columns + set_first_column':
+                   lambda: set_first_column(get_specific_columns(dataframe, list(desired_columns)),
+                                            desired_first_column),
+               'select_columns':
+                   lambda: select_columns(dataframe, list(desired_columns), desired_first_column)}
+
+    results = []
+    expected_result = None
+    for method, selection_function in methods.items():
+        result, seconds, peak_bytes = measure(selection_function)
+        if expected_result is None:
+            expected_result = result
+        results.append({'method': method, 'seconds': round(seconds, 4), 'peak_bytes': peak_bytes,
+                        'selected_bytes': int(result.memory_usage(index=False, deep=False).sum()),
+                        'shares_data': all(numpy.shares_memory(result[column].to_numpy(),
+                                                               dataframe[column].to_numpy())
+                                           for column in result.columns),
+                        'identical': result.equals(expected_result),
+                        'input_unmodified': dataframe.columns.tolist() == input_columns})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--columns', type=int, default=50)
+    arguments = parser.parse_args()
+
+    for benchmark_result in run_benchmark(arguments.rows, arguments.columns):
+        print(f"{benchmark_result['method']:<40} {benchmark_result['seconds']:>8.4f} s "
+              f"peak {benchmark_result['peak_bytes'] / 2 ** 20:8.1f} MB "
+              f"of {benchmark_result['selected_bytes'] / 2 ** 20:.1f} MB selected, "
+              f"shares data: {benchmark_result['shares_data']}, identical: {benchmark_result['identical']}, "
+              f"input unmodified: {benchmark_result['input_unmodified']}")
@@ -0,0 +1,106 @@
+"""
+A benchmark of the tab-delimited readers of csv_manipulation on a synthetic file shaped like inputs/tab_delimited_file,
+with the same dirty cells (trailing and leading spaces such as 'Steele ' and 'James ').
+
+Readers compared, each meant to give a stripped DataFrame:
+    - python: get_dataframe_from_tab_delimited then strip_end_whitespace_from_dataframe (the recommended method)
+    - regex: get_dataframe_using_regex, not stripped as its docstring offers it instead of reading and stripping,
+      so it is reported as different wherever a single space was left around a value
+    - c: get_dataframe_from_tab_delimited(engine='c', strip_whitespace=True)
+    - pyarrow: as c with engine='pyarrow', only if pyarrow is installed
+
+Every reader's DataFrame is checked against the python reader's before its time is reported.
+
+Run from the python_examples directory:
+    python -m csv_manipulation.benchmark_readers --rows 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from . import get_dataframe_from_tab_delimited, get_dataframe_using_regex, strip_end_whitespace_from_dataframe
+
+COLUMNS = ['id', 'ActionID', 'LastName', 'FirstName', 'StateCode', 'PreferredEmail', 'OtherEmail', 'PersonalEmail',
+           'LeadershipRole']
+
+
+def write_tab_delimited_file(path, row_count, dirty_ratio=0.1, seed=0):
+    """
+    :param path: path of the file to write.
+    :param row_count: number of rows below the header.
+    :param dirty_ratio: share of text cells with a leading or trailing space.
+    :param seed: seed of the random generator, the same arguments always give the same file.
+    """
+    random_generator = random.Random(seed)
+
+    def dirty(value):
+        roll = random_generator.random()
+        if roll < dirty_ratio / 2:
+            return value + ' '
+        if roll < dirty_ratio:
+            return ' ' + value
+        return value
+
+    with open(path, 'w', encoding='utf-8') as tab_delimited_file:
+        tab_delimited_file.write('\t'.join(COLUMNS) + '\n')
+        for row_number in range(row_count):
+            row = [str(100000000 + row_number), str(random_generator.randint(1, 9999999)),
+                   dirty(random_generator.choice(['Steele', 'Bond', 'Henderson', 'Watts'])),
+                   dirty(random_generator.choice(['Remington', 'James', 'Lee', 'Shannon'])),
+                   random_generator.choice(['TN', 'MN', 'WA', 'MI']),
+                   dirty(f'a{row_number}email1@example.com'), dirty(f'a{row_number}email2@example.com'),
+                   dirty(f'a{row_number}email3@example.com'),
+                   random_generator.choice(['Chapter Leader', 'Group Leader', 'State Data Lead'])]
+            tab_delimited_file.write('\t'.join(row) + '\n')
+
+
+def get_readers():
+    readers = {'python': lambda path: strip_end_whitespace_from_dataframe(get_dataframe_from_tab_delimited(path)),
+               'regex': lambda path: get_dataframe_using_regex(path),
+               'c': lambda path: get_dataframe_from_tab_delimited(path, engine='c', strip_whitespace=True)}
+    try:
+        import pyarrow
+        readers['pyarrow'] = lambda path: get_dataframe_from_tab_delimited(path, engine='pyarrow',
+                                                                           strip_whitespace=True)
+    except ImportError:
+        pass
+    return readers
+
+
+def run_benchmark(row_count, repeat=3, seed=0):
+    """
+    :return: a list of result dictionaries, one per reader, with the best time of repeat reads.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        path = os.path.join(temporary_directory, 'tab_delimited_file')
+        write_tab_delimited_file(path, row_count, seed=seed)
+
+        expected_dataframe = None
+        for reader_name, reader in get_readers().items():
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                dataframe = reader(path)
+                seconds.append(time.perf_counter() - start)
+
+            if expected_dataframe is None:
+                expected_dataframe = dataframe
+            results.append({'row_count': row_count, 'reader': reader_name, 'seconds': round(min(seconds), 4),
+                            'identical': dataframe.equals(expected_dataframe)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    for rows in arguments.rows:
+        for result in run_benchmark(rows, repeat=arguments.repeat, seed=arguments.seed):
+            print(f"{result['row_count']:>9} {result['reader']:<8} {result['seconds']:>8.3f} s "
+                  f"{'identical' if result['identical'] else 'DIFFERENT from python'}")
@@ -0,0 +1,147 @@
+"""
+A reproducible benchmark for ParentsDictProxy which does not need the warehouse.
+
+generate_website_rankings_selection makes synthetic website_rankings_selection rows shaped like the SQL result:
+    (website_ranking_id, name, is_generic, has_redirect, redirect_id, redirect_name)
+The rows form clusters of redirect chains whose length, loops, generic domains and dangling redirects
+(a redirect to a website without a row) are controlled by the arguments, and are shuffled so redirect targets
+arrive before and after the websites pointing at them.
+
+Each stage is timed on its own and, with --memory, traced with tracemalloc for its peak allocation.
+The networkx stages (label_parents, label_related_parents) are skipped above --networkx-limit websites
+since they are the ones this benchmark is meant to replace.
+
+Run from this directory:
+    python benchmark_parents_dictionary.py --sizes 10000 100000 1000000 5000000 --memory
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from construct_parents_dictionary import CompactRedirectGraph, ParentsDictProxy
+
+
+def generate_website_rankings_selection(website_count, chain_length_mean=3.0, cycle_frequency=0.01,
+                                        generic_ratio=0.05, dangling_ratio=0.001, seed=0):
+    """
+    :param website_count: number of rows to make.
+    :param chain_length_mean: mean number of websites per cluster, lengths are geometrically distributed.
+    :param cycle_frequency: share of clusters ending in a loop of 2 to 4 websites instead of a single parent.
+    :param generic_ratio: share of websites on a generic domain.
+    :param dangling_ratio: share of clusters whose last website redirects to a website without a row.
+    :param seed: seed of the random generator, the same arguments always give the same rows.
+    :return: a list of website_rankings rows.
+    """
+    random_generator = random.Random(seed)
+    rows = []
+    next_id = 1
+
+    while len(rows) < website_count:
+        chain_length = 1
+        while random_generator.random() > 1 / chain_length_mean:
+            chain_length += 1
+        chain_length = min(chain_length, website_count - len(rows))
+
+        chain_ids = list(range(next_id, next_id + chain_length))
+        next_id += chain_length
+        redirect_ids = chain_ids[1:] + [None]
+
+        roll = random_generator.random()
+        if roll < cycle_frequency and chain_length > 1:
+            loop_length = min(chain_length, random_generator.randint(2, 4))
+            redirect_ids[-1] = chain_ids[-loop_length]
+        elif roll < cycle_frequency + dangling_ratio:
+            # the dangling target gets an id that never has a row of its own
+            redirect_ids[-1] = -next_id
+            next_id += 1
+
+        for website_ranking_id, redirect_id in zip(chain_ids, redirect_ids):
+            has_redirect = redirect_id is not None
+            rows.append((website_ranking_id, f'website{website_ranking_id}.com',
+                         random_generator.random() < generic_ratio, has_redirect, redirect_id,
+                         f'website{redirect_id}.com' if has_redirect else None))
+
+    random_generator.shuffle(rows)
+    return rows
+
+
+def measure_stage(stage_function, trace_memory=False):
+    """
+    :return: a tuple (result, seconds, peak_bytes), peak_bytes is None unless trace_memory is set.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = stage_function()
+    seconds = time.perf_counter() - start
+
+    peak_bytes = None
+    if trace_memory:
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak_bytes
+
+
+def run_benchmark(website_count, trace_memory=False, networkx_limit=100000, **generator_arguments):
+    """
+    Times every stage of the networkx and the compact pipelines on one synthetic selection.
+
+    :return: a list of result dictionaries, one per stage.
+    """
+    rows = generate_website_rankings_selection(website_count, **generator_arguments)
+    stages = []
+
+    def record(stage, stage_function):
+        result, seconds, peak_bytes = measure_stage(stage_function, trace_memory=trace_memory)
+        stages.append({'website_count': website_count, 'stage': stage, 'seconds': round(seconds, 4),
+                       'peak_bytes': peak_bytes})
+        return result
+
+    directed_graph = record('make_directed_graph', lambda: ParentsDictProxy.make_directed_graph_from_rows(rows))
+    if website_count <= networkx_limit:
+        record('label_parents', lambda: ParentsDictProxy.label_parents(directed_graph))
+        record('label_related_parents', lambda: ParentsDictProxy.label_related_parents(directed_graph))
+        record('construct_parents_dictionary', lambda: ParentsDictProxy.construct_parents_dictionary(directed_graph))
+    record('construct_parents_dictionary_functional',
+           lambda: ParentsDictProxy.construct_parents_dictionary_functional(directed_graph))
+    del directed_graph
+
+    compact_graph = record('compact_graph', lambda: CompactRedirectGraph(rows))
+    record('compact_construct_parents_dictionary', compact_graph.construct_parents_dictionary)
+
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--chain-length-mean', type=float, default=3.0)
+    parser.add_argument('--cycle-frequency', type=float, default=0.01)
+    parser.add_argument('--generic-ratio', type=float, default=0.05)
+    parser.add_argument('--dangling-ratio', type=float, default=0.001)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true', help='trace the peak allocation of every stage')
+    parser.add_argument('--networkx-limit', type=int, default=100000)
+    parser.add_argument('--json', help='also write the results as JSON Lines to this path')
+    arguments = parser.parse_args()
+
+    results = []
+    for size in arguments.sizes:
+        for stage_result in run_benchmark(size, trace_memory=arguments.memory,
+                                          networkx_limit=arguments.networkx_limit,
+                                          chain_length_mean=arguments.chain_length_mean,
+                                          cycle_frequency=arguments.cycle_frequency,
+                                          generic_ratio=arguments.generic_ratio,
+                                          dangling_ratio=arguments.dangling_ratio,
+                                          seed=arguments.seed):
+            results.append(stage_result)
+            peak = '' if stage_result['peak_bytes'] is None else f"{stage_result['peak_bytes'] / 2 ** 20:10.1f} MB"
+            print(f"{stage_result['website_count']:>9} {stage_result['stage']:<42} "
+                  f"{stage_result['seconds']:>9.3f} s {peak}")
+
+    if arguments.json:
+        with open(arguments.json, 'w', encoding='utf-8') as json_file:
+            for stage_result in results:
+                json_file.write(json.dumps(stage_result) + '\n')
@@ -28,33 +28,216 @@ structure of the warehouse via SQL queries and update statements
 """
 
 
+import json
+import sys
+import time
+import tracemalloc
+
 import networkx as nx
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak RSS is then reported as None
+    resource = None
+
+
+def _max_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
 
 class ParentsDictProxy:
-    def __init__(self, website_rankings_selection):
-        selection_dictionary = {row[0]: list(row[1:6]) for row in website_rankings_selection}
+    def __init__(self, website_rankings_selection, engine='functional', batch_size=10000, on_stage=None,
+                 trace_memory=False):
+        """
+        :param website_rankings_selection: rows as a sequence, an iterator or a DB-API cursor.
+        :param engine: 'functional' (default), 'compact' or 'networkx'.
+        :param batch_size: rows per fetchmany call when reading a cursor.
+        :param on_stage: optional callable receiving a record dictionary after every stage and a final 'summary'
+                         record with graph counts, see json_lines_callback. Nothing is measured when it is None.
+        :param trace_memory: also report the tracemalloc peak of every stage, only used with on_stage.
+                             Tracing the caller already started is kept running (before Python 3.9, which has
+                             no tracemalloc.reset_peak, its peak may then include what ran before the stage).
+        """
+        if engine not in ('functional', 'compact', 'networkx'):
+            raise ValueError(f"Unknown engine: {engine}. Valid engines are 'functional', 'compact' and 'networkx'")
+        self.on_stage = on_stage
+        self.trace_memory = trace_memory
+        self._stage_seconds = 0.0
+
+        # rows are consumed as they arrive (fetchmany batches for a DB-API cursor) instead of being copied first
+        website_rankings = self.iterate_selection(website_rankings_selection, batch_size=batch_size)
+
+        # 'compact' never builds a networkx graph, see CompactRedirectGraph for the memory it needs per website
+        if engine == 'compact':
+            compact_graph = self._run_stage('compact_graph', lambda: CompactRedirectGraph(website_rankings))
+            self.parents_dictionary = self._run_stage('construct_parents_dictionary',
+                                                      compact_graph.construct_parents_dictionary)
+            if on_stage is not None:
+                self._report_summary(compact_graph.successors.tolist())
+            return
+
+        directed_graph = self._run_stage('make_directed_graph',
+                                         lambda: self.make_directed_graph_from_rows(website_rankings))
+
+        # 'functional' labels the whole graph in one linear pass, 'networkx' is the original per node traversal
+        if engine == 'functional':
+            self.parents_dictionary = self._run_stage('construct_parents_dictionary_functional',
+                                                      lambda: self.construct_parents_dictionary_functional(
+                                                          directed_graph))
+        else:
+            self._run_stage('label_parents', lambda: self.label_parents(directed_graph))
+            self._run_stage('label_related_parents', lambda: self.label_related_parents(directed_graph))
+
+            self.parents_dictionary = self._run_stage('construct_parents_dictionary',
+                                                      lambda: self.construct_parents_dictionary(directed_graph))
+
+        if on_stage is not None:
+            successors = self.functional_arrays_from_directed_graph(directed_graph)[3]
+            self._report_summary(successors, directed_graph=directed_graph if engine == 'networkx' else None)
+
+    def _run_stage(self, stage, stage_function):
+        if self.on_stage is None:
+            return stage_function()
+
+        max_rss_before = _max_rss_bytes()
+        # tracing already started by the caller is left running, only the peak is reset for the stage
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self.trace_memory and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        traced_bytes_before = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        start = time.perf_counter()
+
+        result = stage_function()
+
+        seconds = time.perf_counter() - start
+        tracemalloc_peak_bytes = None
+        if self.trace_memory:
+            # relative to the memory traced when the stage started, as if tracing started with the stage
+            tracemalloc_peak_bytes = tracemalloc.get_traced_memory()[1] - traced_bytes_before
+        if started_tracing:
+            tracemalloc.stop()
+        max_rss_after = _max_rss_bytes()
+
+        self._stage_seconds += seconds
+        self.on_stage({'stage': stage,
+                       'seconds': seconds,
+                       'max_rss_bytes': max_rss_after,
+                       'max_rss_delta_bytes': None if max_rss_after is None else max_rss_after - max_rss_before,
+                       'tracemalloc_peak_bytes': tracemalloc_peak_bytes})
+        return result
+
+    def _report_summary(self, successors, directed_graph=None):
+        counts = self.redirect_graph_statistics(successors)
+        counts['clusters'] = len(self.parents_dictionary)
+
+        # the networkx stages call nx.ancestors once per parent (twice when it has any) and nx.descendants per node
+        if directed_graph is not None:
+            counts['ancestors_calls'] = sum(1 + ('ancestors' in attributes)
+                                            for _, attributes in directed_graph.nodes(data=True)
+                                            if attributes['is_parent'])
+            counts['descendants_calls'] = counts['nodes']
+        else:
+            counts['ancestors_calls'] = counts['descendants_calls'] = 0
+
+        self.on_stage({'stage': 'summary', 'seconds': self._stage_seconds, 'max_rss_bytes': _max_rss_bytes(),
+                       'counts': counts})
 
-        directed_graph = self.make_directed_graph(selection_dictionary)
-        self.label_parents(directed_graph)
-        self.label_related_parents(directed_graph)
+    @staticmethod
+    def json_lines_callback(stream):
+        """
+        :param stream: a writable text stream, e.g. sys.stderr or an open log file.
+        :return: an on_stage callable writing every record to the stream as one JSON line.
+        """
+        def write_record(record):
+            stream.write(json.dumps(record) + '\n')
+        return write_record
 
-        self.parents_dictionary = self.construct_parents_dictionary(directed_graph)
-        pass
+    @staticmethod
+    def redirect_graph_statistics(successors):
+        """
+        :param successors: position of the redirect of each website, or -1 if none.
+        :return: a dictionary of nodes, edges, cycles (loops of redirects) and longest_chain
+                 (most redirects from a website to its nearest parent).
+        """
+        is_parent, nearest_parent, cluster = ParentsDictProxy.label_functional_graph(successors)
+
+        chain_lengths = [0 if parent else -1 for parent in is_parent]
+        for start in range(len(successors)):
+            walk = []
+            target = start
+            while chain_lengths[target] == -1:
+                walk.append(target)
+                target = successors[target]
+            chain_length = chain_lengths[target]
+            for tail in reversed(walk):
+                chain_length += 1
+                chain_lengths[tail] = chain_length
+
+        return {'nodes': len(successors),
+                'edges': sum(successor != -1 for successor in successors),
+                'cycles': len({cluster[position] for position, successor in enumerate(successors)
+                               if is_parent[position] and successor != -1}),
+                'longest_chain': max(chain_lengths, default=0)}
+
+    @staticmethod
+    def iterate_selection(website_rankings_selection, batch_size=10000):
+        """
+        Yields website_rankings rows one at a time from a sequence, an iterator or a DB-API cursor.
+
+        A cursor is read with fetchmany(batch_size) so only one batch of the SQL result is held in memory.
+
+        :param website_rankings_selection: rows of (id, name, is_generic, has_redirect, redirect_id, redirect_name).
+        :param batch_size: number of rows requested per fetchmany call.
+        :return: a generator of rows.
+        """
+        if hasattr(website_rankings_selection, 'fetchmany'):
+            while True:
+                batch = website_rankings_selection.fetchmany(batch_size)
+                if not batch:
+                    break
+                for row in batch:
+                    yield row
+        else:
+            for row in website_rankings_selection:
+                yield row
 
     @staticmethod
     def make_directed_graph(selection_dictionary):
+        website_rankings = ((website_ranking_id, *attributes)
+                            for website_ranking_id, attributes in selection_dictionary.items())
+        return ParentsDictProxy.make_directed_graph_from_rows(website_rankings)
+
+    @staticmethod
+    def make_directed_graph_from_rows(website_rankings):
+        """
+        Builds the redirect graph in a single pass over the rows.
+
+        A redirect target which has not been seen yet is added as a non generic node with the redirect name,
+        its own row sets is_generic (and the name) once it arrives. A target without a row keeps those values.
+
+        :param website_rankings: an iterable of website_rankings rows.
+        :return: a networkx.DiGraph with one node per website and one edge per redirect.
+        """
         directed_graph = nx.DiGraph()
-        for website_ranking_id, attributes in selection_dictionary.items():
-            website_ranking_name = attributes[0]
-            bool_generic_domain, bool_redirect = attributes[1], attributes[2]
-            redirect_id, redirect_name = attributes[3], attributes[4]
+        for row in website_rankings:
+            website_ranking_id, website_ranking_name = row[0], row[1]
+            bool_generic_domain, bool_redirect = row[2], row[3]
+            redirect_id, redirect_name = row[4], row[5]
 
             directed_graph.add_node(website_ranking_id, name=website_ranking_name, is_parent=False,
                                     is_generic=bool_generic_domain)
             if bool_redirect:
-                red_is_generic = selection_dictionary[redirect_id][1]
-                directed_graph.add_node(redirect_id, name=redirect_name, is_parent=False, is_generic=red_is_generic)
+                if redirect_id in directed_graph:
+                    directed_graph.add_node(redirect_id, name=redirect_name, is_parent=False)
+                else:
+                    directed_graph.add_node(redirect_id, name=redirect_name, is_parent=False, is_generic=False)
                 directed_graph.add_edge(website_ranking_id, redirect_id)
         return directed_graph
 
@@ -130,96 +313,598 @@ class ParentsDictProxy:
 
     @staticmethod
     def construct_parents_dictionary(directed_graph):
+        """
+        Builds the parents_dictionary from a graph labelled by label_parents and label_related_parents.
+
+        Cluster membership is kept in a DisjointSet (one union per redirect) which also merges the generic flags,
+        so deciding the operating parent of a website is a single find instead of scanning its related parents.
+
+        :param directed_graph: a labelled networkx.DiGraph made by make_directed_graph.
+        :return: parents_dictionary keyed by the operating parent id of each cluster.
+        """
+        clusters = DisjointSet()
+        for website_ranking_id, is_generic in directed_graph.nodes(data='is_generic'):
+            clusters.add(website_ranking_id, is_generic)
+        for website_ranking_id, redirect_id in directed_graph.edges:
+            clusters.union(website_ranking_id, redirect_id)
+
         parents_dictionary = {}
+        operating_parents = {}
+        for website_ranking_id, attributes in directed_graph.nodes(data=True):
+            root = clusters.find(website_ranking_id)
+
+            # the first website of a cluster decides its operating parent, later ones only join it
+            if root not in operating_parents:
+                operating_parent = website_ranking_id if attributes['is_parent'] else attributes['nearest_parent']
+                operating_parents[root] = operating_parent
+
+                # a lone website keeps its own is_generic value, any merge turns the flag into a boolean
+                if clusters.size(root) == 1:
+                    generic_cluster = attributes['is_generic']
+                else:
+                    generic_cluster = clusters.is_generic(root)
+
+                operating_parent_name = directed_graph.nodes[operating_parent]['name']
+                parents_dictionary.update({operating_parent: {'org_website_ranking_name': operating_parent_name,
+                                                              'generic_cluster': generic_cluster,
+                                                              'related_objects': {operating_parent},
+                                                              'related_names': {operating_parent_name}}})
+
+            # parents on a loop other than the operating parent only contribute to generic_cluster
+            if not attributes['is_parent']:
+                operating_parent = operating_parents[root]
+                parents_dictionary[operating_parent]['related_objects'].add(website_ranking_id)
+                parents_dictionary[operating_parent]['related_names'].add(attributes['name'])
+
+        return parents_dictionary
 
+    @staticmethod
+    def label_functional_graph(successors):
+        """
+        Labels every website of a functional graph (at most one redirect per website) in a single O(n) pass.
+
+        Each unvisited website starts a walk along its redirects which stops at a website without a redirect,
+        a website already on the current walk (a loop) or a website labelled by an earlier walk.
+        Websites without a redirect and websites on a loop are parents, every other website on the walk is a tail
+        and takes the nearest parent and cluster of its redirect, so each website is walked exactly once.
+
+        :param successors: a sequence where successors[i] is the position of the redirect of website i, or -1 if none.
+        :return: a tuple of lists (is_parent, nearest_parent, cluster) indexed by website position.
+        """
+        website_count = len(successors)
+        unvisited, on_walk, labelled = 0, 1, 2
+
+        state = [unvisited] * website_count
+        walk_position = [-1] * website_count
+        is_parent = [False] * website_count
+        nearest_parent = [-1] * website_count
+        cluster = [-1] * website_count
+        cluster_count = 0
+
+        for start in range(website_count):
+            if state[start] != unvisited:
+                continue
+
+            walk = []
+            target = start
+            while target != -1 and state[target] == unvisited:
+                state[target] = on_walk
+                walk_position[target] = len(walk)
+                walk.append(target)
+                target = successors[target]
+
+            # the walk ended on a new cluster: a website without a redirect or a loop of redirects
+            if target == -1 or state[target] == on_walk:
+                tail_length = len(walk) - 1 if target == -1 else walk_position[target]
+                for parent in walk[tail_length:]:
+                    is_parent[parent] = True
+                    nearest_parent[parent] = parent
+                    cluster[parent] = cluster_count
+                    state[parent] = labelled
+                cluster_count += 1
+                walk = walk[:tail_length]
+
+            # the rest of the walk trails into a labelled website, so label it back to front
+            for tail in reversed(walk):
+                successor = successors[tail]
+                nearest_parent[tail] = successor if is_parent[successor] else nearest_parent[successor]
+                cluster[tail] = cluster[successor]
+                state[tail] = labelled
+
+        return is_parent, nearest_parent, cluster
+
+    @staticmethod
+    def functional_arrays_from_directed_graph(directed_graph):
+        """
+        Flattens a graph made by make_directed_graph into position indexed lists for label_functional_graph.
+
+        :param directed_graph: a networkx.DiGraph where every node has at most one successor.
+        :return: a tuple of lists (website_ranking_ids, names, generics, successors) in node order.
+        """
         website_ranking_ids = list(directed_graph.nodes)
-        for website_ranking_id in website_ranking_ids:
-            website_ranking_name = directed_graph.nodes[website_ranking_id]['name']
-
-            # this is an expensive operation to be doing a quarter of a mil times
-            added_parents = parents_dictionary.keys()
-
-            is_parent = directed_graph.nodes[website_ranking_id]['is_parent']
-            is_generic = directed_graph.nodes[website_ranking_id]['is_generic']
-
-            in_dictionary = website_ranking_id in added_parents
-
-            # this will include self
-            all_related_parents = directed_graph.nodes[website_ranking_id]['all_related_parents']
-            many_parents = len(all_related_parents) > 1
-
-            # decide if to add parents dictionary?
-            if is_parent:
-                if many_parents:
-                    has_parent_in_dictionary = any(
-                        [related_parent in added_parents for related_parent in all_related_parents])
-                    if not has_parent_in_dictionary and not in_dictionary:
-                        parents_dictionary.update(
-                            {website_ranking_id: {'org_website_ranking_name': website_ranking_name,
-                                                  'generic_cluster': is_generic,
-                                                  'related_objects': {website_ranking_id},
-                                                  'related_names': {website_ranking_name}}})
-                    else:
-                        # includes self
-                        for related_parent in all_related_parents:
-                            related_parent_in_dictionary = related_parent in added_parents
-                            if related_parent_in_dictionary:
-                                operating_parent = related_parent
-                                either_generic = any([directed_graph.nodes[website_ranking_id]['is_generic'],
-                                                      parents_dictionary[operating_parent]['generic_cluster']])
-                                parents_dictionary[operating_parent]['generic_cluster'] = either_generic
-                                break
-
-                elif not in_dictionary:
-                    parents_dictionary.update({website_ranking_id: {'org_website_ranking_name': website_ranking_name,
-                                                                    'generic_cluster': is_generic,
-                                                                    'related_objects': {website_ranking_id},
-                                                                    'related_names': {website_ranking_name}}})
+        positions = {website_ranking_id: position for position, website_ranking_id in enumerate(website_ranking_ids)}
 
-                else:
-                    either_generic = any([directed_graph.nodes[website_ranking_id]['is_generic'],
-                                          parents_dictionary[website_ranking_id]['generic_cluster']])
-                    parents_dictionary[website_ranking_id]['generic_cluster'] = either_generic
+        names, generics, successors = [], [], []
+        for website_ranking_id, attributes in directed_graph.nodes(data=True):
+            names.append(attributes['name'])
+            generics.append(attributes['is_generic'])
+            redirects = list(directed_graph.successors(website_ranking_id))
+            successors.append(positions[redirects[0]] if redirects else -1)
 
-            else:
-                if many_parents:
-                    operating_parent = None
-                    has_parent_in_dictionary = any(
-                        [related_parent in added_parents for related_parent in all_related_parents])
-                    if has_parent_in_dictionary:
-                        for related_parent in all_related_parents:
-                            parent_in_dictionary = related_parent in added_parents
-                            if parent_in_dictionary:
-                                operating_parent = related_parent
-                                either_generic = any([directed_graph.nodes[website_ranking_id]['is_generic'],
-                                                      parents_dictionary[operating_parent]['generic_cluster']])
-                                parents_dictionary[operating_parent]['generic_cluster'] = either_generic
-                                break
+        return website_ranking_ids, names, generics, successors
 
-                    else:
-                        operating_parent = directed_graph.nodes[website_ranking_id]['nearest_parent']
+    @staticmethod
+    def construct_parents_dictionary_functional(directed_graph):
+        website_ranking_ids, names, generics, successors = \
+            ParentsDictProxy.functional_arrays_from_directed_graph(directed_graph)
+        return ParentsDictProxy.construct_parents_dictionary_from_arrays(website_ranking_ids, names, generics,
+                                                                         successors)
 
-                    if operating_parent is None:
-                        operating_parent = directed_graph.nodes[website_ranking_id]['nearest_parent']
+    @staticmethod
+    def construct_parents_dictionary_from_arrays(website_ranking_ids, names, generics, successors, labels=None):
+        """
+        Builds the same parents_dictionary as construct_parents_dictionary without the networkx traversals.
+
+        The first website of a cluster (in node order) picks the operating parent: itself if it is a parent,
+        otherwise its nearest parent. Tails are added to the related objects of that parent while the other parents
+        of a loop are only merged into its generic_cluster flag, exactly as construct_parents_dictionary does.
+
+        :param website_ranking_ids: website ranking ids in node order.
+        :param names: website ranking names indexed by position.
+        :param generics: is_generic values indexed by position.
+        :param successors: position of the redirect of each website, or -1 if none.
+        :param labels: optional (is_parent, nearest_parent, cluster) already returned by label_functional_graph.
+        :return: parents_dictionary keyed by the operating parent id of each cluster.
+        """
+        if labels is None:
+            labels = ParentsDictProxy.label_functional_graph(successors)
+        is_parent, nearest_parent, cluster = labels
+
+        cluster_count = max(cluster, default=-1) + 1
+        cluster_sizes = [0] * cluster_count
+        cluster_generic = [False] * cluster_count
+        for position, cluster_id in enumerate(cluster):
+            cluster_sizes[cluster_id] += 1
+            cluster_generic[cluster_id] = cluster_generic[cluster_id] or bool(generics[position])
 
+        parents_dictionary = {}
+        operating_parents = [-1] * cluster_count
+        for position, cluster_id in enumerate(cluster):
+            operating_parent = operating_parents[cluster_id]
+            if operating_parent == -1:
+                operating_parent = position if is_parent[position] else nearest_parent[position]
+                operating_parents[cluster_id] = operating_parent
+
+                # a lone website keeps its own is_generic value, any merge turns the flag into a boolean
+                if cluster_sizes[cluster_id] == 1:
+                    generic_cluster = generics[operating_parent]
                 else:
-                    operating_parent = directed_graph.nodes[website_ranking_id]['nearest_parent']
+                    generic_cluster = cluster_generic[cluster_id]
 
-                operating_parent_in_dictionary = operating_parent in added_parents
-                if operating_parent_in_dictionary:
-                    either_generic = any([directed_graph.nodes[website_ranking_id]['is_generic'],
-                                          parents_dictionary[operating_parent]['generic_cluster']])
-                else:
-                    either_generic = any([directed_graph.nodes[website_ranking_id]['is_generic'],
-                                          directed_graph.nodes[operating_parent]['is_generic']])
-                    operating_parent_name = directed_graph.nodes[operating_parent]['name']
-                    parents_dictionary.update({operating_parent: {'org_website_ranking_name': operating_parent_name,
-                                                                  'generic_cluster': either_generic,
-                                                                  'related_objects': {operating_parent},
-                                                                  'related_names': {operating_parent_name}}})
+                operating_parent_name = names[operating_parent]
+                parents_dictionary.update({website_ranking_ids[operating_parent]: {
+                    'org_website_ranking_name': operating_parent_name,
+                    'generic_cluster': generic_cluster,
+                    'related_objects': {website_ranking_ids[operating_parent]},
+                    'related_names': {operating_parent_name}}})
 
-                parents_dictionary[operating_parent]['related_objects'].add(website_ranking_id)
-                parents_dictionary[operating_parent]['related_names'].add(website_ranking_name)
-                parents_dictionary[operating_parent]['generic_cluster'] = either_generic
+            if not is_parent[position]:
+                parents_dictionary[website_ranking_ids[operating_parent]]['related_objects'].add(
+                    website_ranking_ids[position])
+                parents_dictionary[website_ranking_ids[operating_parent]]['related_names'].add(names[position])
 
         return parents_dictionary
+
+
+class DisjointSet:
+    """
+    Union-find over website ranking ids with path compression and union by rank.
+
+    Every set also carries whether any of its members is generic, merged when two sets are joined.
+    """
+
+    def __init__(self):
+        self._parent = {}
+        self._rank = {}
+        self._size = {}
+        self._is_generic = {}
+
+    def __contains__(self, element):
+        return element in self._parent
+
+    def add(self, element, is_generic=False):
+        if element not in self._parent:
+            self._parent[element] = element
+            self._rank[element] = 0
+            self._size[element] = 1
+            self._is_generic[element] = bool(is_generic)
+
+    def find(self, element):
+        root = element
+        while self._parent[root] != root:
+            root = self._parent[root]
+
+        # path compression: point every element on the way straight at the root
+        while self._parent[element] != root:
+            self._parent[element], element = root, self._parent[element]
+
+        return root
+
+    def union(self, element, other_element):
+        root, other_root = self.find(element), self.find(other_element)
+        if root == other_root:
+            return root
+
+        if self._rank[root] < self._rank[other_root]:
+            root, other_root = other_root, root
+        elif self._rank[root] == self._rank[other_root]:
+            self._rank[root] += 1
+
+        self._parent[other_root] = root
+        self._size[root] += self._size.pop(other_root)
+        self._is_generic[root] = self._is_generic[root] or self._is_generic.pop(other_root)
+        del self._rank[other_root]
+        return root
+
+    def size(self, element):
+        return self._size[self.find(element)]
+
+    def is_generic(self, element):
+        return self._is_generic[self.find(element)]
+
+
+class CompactRedirectGraph:
+    """
+    An array backed alternative to the networkx.DiGraph built by ParentsDictProxy.make_directed_graph.
+
+    Website ranking ids are mapped to dense positions (in the same order make_directed_graph adds nodes) and
+    every per node attribute is a flat array indexed by position:
+        - successors: numpy int32 array, the position of the redirect or -1 for no redirect (4 bytes)
+        - is_generic: numpy bool array (1 byte)
+        - is_parent: numpy bool array, filled by label() (1 byte)
+        - website_ranking_ids: list of the original ids (8 byte reference)
+        - names: list of interned names, repeated names share one string (8 byte reference)
+
+    That is 22 bytes per website plus the id and name objects themselves. Measured with tracemalloc on 100k
+    websites with unique names this is about 115 bytes per website, against about 680 bytes per website for the
+    networkx graph before label_parents and label_related_parents add their attributes.
+    The id to position dictionary is only kept while the graph is being built.
+
+    is_generic is stored as a boolean, so a lone website's generic_cluster is True/False rather than
+    the raw value from the selection.
+    """
+
+    def __init__(self, website_rankings):
+        """
+        :param website_rankings: an iterable of website_rankings rows, consumed in a single pass.
+        """
+        import numpy
+
+        positions = {}
+        website_ranking_ids, names, generics, successors = [], [], [], []
+
+        def add_website(website_ranking_id, website_ranking_name):
+            # mirrors networkx.DiGraph.add_node: first call fixes the position, later calls overwrite the name
+            position = positions.get(website_ranking_id)
+            if position is None:
+                position = len(website_ranking_ids)
+                positions[website_ranking_id] = position
+                website_ranking_ids.append(website_ranking_id)
+                names.append(None)
+                generics.append(False)
+                successors.append(-1)
+            names[position] = sys.intern(website_ranking_name) if type(website_ranking_name) is str \
+                else website_ranking_name
+            return position
+
+        # like make_directed_graph_from_rows, a redirect target is non generic until its own row arrives
+        for row in website_rankings:
+            website_ranking_id, website_ranking_name = row[0], row[1]
+            bool_generic_domain, bool_redirect = row[2], row[3]
+            redirect_id, redirect_name = row[4], row[5]
+
+            position = add_website(website_ranking_id, website_ranking_name)
+            generics[position] = bool(bool_generic_domain)
+            if bool_redirect:
+                successors[position] = add_website(redirect_id, redirect_name)
+
+        self.website_ranking_ids = website_ranking_ids
+        self.names = names
+        self.successors = numpy.array(successors, dtype=numpy.int32)
+        self.is_generic = numpy.array(generics, dtype=bool)
+        self.is_parent = numpy.zeros(len(website_ranking_ids), dtype=bool)
+
+    def __len__(self):
+        return len(self.website_ranking_ids)
+
+    def label(self):
+        """
+        Labels the graph with ParentsDictProxy.label_functional_graph and fills is_parent.
+
+        :return: a tuple of lists (is_parent, nearest_parent, cluster) indexed by website position.
+        """
+        is_parent, nearest_parent, cluster = ParentsDictProxy.label_functional_graph(self.successors.tolist())
+        self.is_parent[:] = is_parent
+        return is_parent, nearest_parent, cluster
+
+    def construct_parents_dictionary(self):
+        """
+        Builds the parents_dictionary straight from the arrays, no networkx graph is involved.
+
+        :return: parents_dictionary keyed by the operating parent id of each cluster.
+        """
+        return ParentsDictProxy.construct_parents_dictionary_from_arrays(self.website_ranking_ids, self.names,
+                                                                         self.is_generic.tolist(),
+                                                                         self.successors.tolist(),
+                                                                         labels=self.label())
+
+
+class IncrementalParentsDict:
+    """
+    A persistent parents_dictionary which is kept up to date from website_rankings deltas
+    instead of rebuilding the whole graph on every run.
+
+    Rows have the same shape as website_rankings_selection and keep the position of their first insert,
+    so the result always equals ParentsDictProxy over the current rows in that order.
+    Each batch of changes only relabels the clusters the changed websites belonged to or now redirect into,
+    every other website keeps its organization untouched.
+
+    A redirect to a website without a row (e.g. a deleted one) keeps that website as a node with the name
+    from the redirect and is_generic False, the same way make_directed_graph_from_rows adds a missing target.
+    """
+
+    def __init__(self, website_rankings_selection=()):
+        self.selection_dictionary = {}
+        self.parents_dictionary = {}
+        # website_ranking_id -> operating parent id (the parents_dictionary key) of its organization
+        self.organizations = {}
+
+        self._row_sequence = {}
+        self._next_row_sequence = 0
+        self._redirected_from = {}
+        self._cluster_members = {}
+
+        self.apply(upserts=website_rankings_selection)
+
+    def upsert(self, row):
+        return self.apply(upserts=[row])
+
+    def delete(self, website_ranking_id):
+        return self.apply(deletions=[website_ranking_id])
+
+    def apply(self, upserts=(), deletions=()):
+        """
+        Applies inserts, redirect changes and deletions of website_rankings and relabels the affected clusters.
+
+        :param upserts: rows shaped like website_rankings_selection, new ids are inserted and known ids are replaced.
+        :param deletions: website ranking ids to remove.
+        :return: a dictionary {website_ranking_id: (old_organization, new_organization)} of every website whose
+                 organization changed, None stands for a website which was not or is no longer in the graph.
+        """
+        touched = set()
+        for row in upserts:
+            website_ranking_id = row[0]
+            touched.update(self._remove_row(website_ranking_id))
+            touched.update(self._add_row(website_ranking_id, list(row[1:6])))
+        for website_ranking_id in deletions:
+            touched.update(self._remove_row(website_ranking_id, forget_sequence=True))
+
+        # whole clusters are relabelled since moving one redirect can change the parent of the entire cluster
+        affected = set()
+        for website_ranking_id in touched:
+            organization = self.organizations.get(website_ranking_id)
+            if organization is None:
+                affected.add(website_ranking_id)
+            elif organization in self._cluster_members:
+                affected.update(self._cluster_members.pop(organization))
+                del self.parents_dictionary[organization]
+
+        old_organizations = {website_ranking_id: self.organizations.pop(website_ranking_id, None)
+                             for website_ranking_id in affected}
+        self._relabel([website_ranking_id for website_ranking_id in affected if self._is_node(website_ranking_id)])
+
+        changes = {}
+        for website_ranking_id, old_organization in old_organizations.items():
+            new_organization = self.organizations.get(website_ranking_id)
+            if new_organization != old_organization:
+                changes[website_ranking_id] = (old_organization, new_organization)
+        return changes
+
+    def _redirect_id(self, website_ranking_id):
+        attributes = self.selection_dictionary.get(website_ranking_id)
+        if attributes is None or not attributes[2]:
+            return None
+        return attributes[3]
+
+    def _is_node(self, website_ranking_id):
+        return website_ranking_id in self.selection_dictionary or website_ranking_id in self._redirected_from
+
+    def _add_row(self, website_ranking_id, attributes):
+        if website_ranking_id not in self._row_sequence:
+            self._row_sequence[website_ranking_id] = self._next_row_sequence
+            self._next_row_sequence += 1
+        self.selection_dictionary[website_ranking_id] = attributes
+
+        redirect_id = self._redirect_id(website_ranking_id)
+        if redirect_id is None:
+            return [website_ranking_id]
+        self._redirected_from.setdefault(redirect_id, set()).add(website_ranking_id)
+        return [website_ranking_id, redirect_id]
+
+    def _remove_row(self, website_ranking_id, forget_sequence=False):
+        redirect_id = self._redirect_id(website_ranking_id)
+        self.selection_dictionary.pop(website_ranking_id, None)
+        if forget_sequence:
+            self._row_sequence.pop(website_ranking_id, None)
+        if redirect_id is None:
+            return [website_ranking_id]
+
+        redirected_from = self._redirected_from[redirect_id]
+        redirected_from.discard(website_ranking_id)
+        if not redirected_from:
+            del self._redirected_from[redirect_id]
+        return [website_ranking_id, redirect_id]
+
+    def _node_attributes(self, website_ranking_id):
+        """
+        Replays the add_node calls make_directed_graph would make for a website over the current rows.
+
+        :return: a tuple (node_order, name, is_generic) where node_order sorts websites like the graph's nodes.
+        """
+        writes = []
+        attributes = self.selection_dictionary.get(website_ranking_id)
+        if attributes is not None:
+            writes.append((2 * self._row_sequence[website_ranking_id], attributes[0]))
+        for redirected_from in self._redirected_from.get(website_ranking_id, ()):
+            writes.append((2 * self._row_sequence[redirected_from] + 1,
+                           self.selection_dictionary[redirected_from][4]))
+
+        # the first add_node call places the node, the last one sets its name
+        node_order = min(write[0] for write in writes)
+        name = max(writes, key=lambda write: write[0])[1]
+        is_generic = attributes[1] if attributes is not None else False
+        return node_order, name, is_generic
+
+    def _relabel(self, website_ranking_ids):
+        node_attributes = {website_ranking_id: self._node_attributes(website_ranking_id)
+                           for website_ranking_id in website_ranking_ids}
+        website_ranking_ids = sorted(website_ranking_ids, key=lambda website_ranking_id:
+                                     node_attributes[website_ranking_id][0])
+        positions = {website_ranking_id: position for position, website_ranking_id in enumerate(website_ranking_ids)}
+
+        names = [node_attributes[website_ranking_id][1] for website_ranking_id in website_ranking_ids]
+        generics = [node_attributes[website_ranking_id][2] for website_ranking_id in website_ranking_ids]
+        successors = []
+        for website_ranking_id in website_ranking_ids:
+            redirect_id = self._redirect_id(website_ranking_id)
+            successors.append(-1 if redirect_id is None else positions[redirect_id])
+
+        labels = ParentsDictProxy.label_functional_graph(successors)
+        parents_dictionary = ParentsDictProxy.construct_parents_dictionary_from_arrays(website_ranking_ids, names,
+                                                                                       generics, successors,
+                                                                                       labels=labels)
+        cluster = labels[2]
+        cluster_organizations = {cluster[positions[organization]]: organization for organization in parents_dictionary}
+        for website_ranking_id in website_ranking_ids:
+            organization = cluster_organizations[cluster[positions[website_ranking_id]]]
+            self.organizations[website_ranking_id] = organization
+            self._cluster_members.setdefault(organization, set()).add(website_ranking_id)
+
+        self.parents_dictionary.update(parents_dictionary)
+
+
+class ParentsQuery:
+    """
+    Answers ParentsDictProxy.find_nearest_parent and find_all_related_parents on demand,
+    without labelling the whole graph first.
+
+    A lookup walks the redirects until it reaches a website already answered, a website without a redirect
+    or a loop, and memoizes the answer for every website on that walk, so each website is walked at most once.
+
+    With bounded_memory=True only one representative website per loop is memoized: the website a walk first
+    came back on. A lookup walks until it reaches a website without a redirect or a known representative, then
+    walks that loop once to find where it entered it, so memory grows with the number of loops instead of the
+    number of websites in exchange for walking the tail and the loop again on each lookup.
+    """
+
+    def __init__(self, directed_graph, bounded_memory=False):
+        """
+        :param directed_graph: a networkx.DiGraph made by make_directed_graph, labelling is not required.
+        :param bounded_memory: memoize one representative website per loop only.
+        """
+        self.directed_graph = directed_graph
+        self.bounded_memory = bounded_memory
+
+        self._nearest_parents = {}
+        # parent -> every parent of its cluster, shared by all parents of one loop
+        self._related_parents = {}
+        # the only memo of bounded_memory
+        self._loop_representatives = set()
+
+    def _redirect(self, website_ranking_id):
+        for redirect_id in self.directed_graph.successors(website_ranking_id):
+            return redirect_id
+        return None
+
+    def _loop_parents(self, parent):
+        # a parent without a redirect is alone, a parent on a loop comes back to itself
+        loop_parents = [parent]
+        redirect_id = self._redirect(parent)
+        while redirect_id is not None and redirect_id != parent:
+            loop_parents.append(redirect_id)
+            redirect_id = self._redirect(redirect_id)
+        return loop_parents
+
+    def _nearest_parent_bounded(self, website_ranking_id):
+        walk = []
+        walked = set()
+        target = website_ranking_id
+        while target not in self._loop_representatives:
+            if target in walked:
+                # the walk came back on itself, a new loop which it entered at target
+                self._loop_representatives.add(target)
+                return target
+
+            redirect_id = self._redirect(target)
+            if redirect_id is None:
+                return target
+
+            walked.add(target)
+            walk.append(target)
+            target = redirect_id
+
+        # a known loop, the walk may have entered it before reaching its representative
+        loop_parents = set(self._loop_parents(target))
+        for website in walk:
+            if website in loop_parents:
+                return website
+        return target
+
+    def nearest_parent(self, website_ranking_id):
+        if self.bounded_memory:
+            return self._nearest_parent_bounded(website_ranking_id)
+
+        walk = []
+        walk_positions = {}
+        target = website_ranking_id
+        while target not in self._nearest_parents:
+            if target in walk_positions:
+                # the walk came back on itself, every website from there on is a parent of the loop
+                loop = tuple(walk[walk_positions[target]:])
+                for parent in loop:
+                    self._nearest_parents[parent] = parent
+                    self._related_parents[parent] = loop
+                del walk[walk_positions[target]:]
+                break
+
+            redirect_id = self._redirect(target)
+            if redirect_id is None:
+                self._nearest_parents[target] = target
+                self._related_parents[target] = (target,)
+                break
+
+            walk_positions[target] = len(walk)
+            walk.append(target)
+            target = redirect_id
+
+        # every website left on the walk trails into the same parent
+        nearest_parent = self._nearest_parents[target]
+        for tail in walk:
+            self._nearest_parents[tail] = nearest_parent
+        return nearest_parent
+
+    def is_parent(self, website_ranking_id):
+        return self.nearest_parent(website_ranking_id) == website_ranking_id
+
+    def all_related_parents(self, website_ranking_id):
+        """
+        :return: the parents of the website's cluster, starting with the website itself if it is a parent.
+        """
+        nearest_parent = self.nearest_parent(website_ranking_id)
+        if self.bounded_memory:
+            related_parents = self._loop_parents(nearest_parent)
+        else:
+            related_parents = self._related_parents[nearest_parent]
+        if nearest_parent != website_ranking_id:
+            return list(related_parents)
+        return [website_ranking_id] + [parent for parent in related_parents if parent != website_ranking_id]
@@ -0,0 +1,220 @@
+"""
+A binary snapshot of the parents_dictionary made by ParentsDictProxy (construct_parents_dictionary.py).
+
+The snapshot is written once per run and opened with mmap by any reader (the Flask service, reporting jobs),
+so startup does not load or rebuild anything and looking up a website's organization is O(1)
+without the dictionary of Python sets.
+
+Website ranking ids must be integers, they are stored as int64. A missing (None) name is stored as an empty string.
+
+A parents_dictionary does not list the parents on a loop other than the operating parent in any related_objects,
+so on its own the snapshot can not look them up. Pass website_organizations to ParentsSnapshot.write
+(see website_organizations_from_arrays) to index every website of every cluster.
+
+Layout (little endian), every section starts on an 8 byte boundary:
+    header               magic, section count and an (offset, length) pair per section
+    website_ids          int64[W]   every website in a related_objects set, grouped by cluster, followed by
+                                    the websites only found in website_organizations
+    website_clusters     int32[W]   cluster index of each website
+    hash_slots           int32[S]   open addressing table of website positions (-1 empty), S a power of two >= 2W
+    cluster_ids          int64[C]   the parents_dictionary key (operating parent) of each cluster
+    cluster_generic      uint8[C]   generic_cluster of each cluster
+    member_offsets       int64[C+1] CSR offsets of each cluster's websites into website_ids
+    name_offsets         int64[N+1] offsets of every name into names, org name of cluster c is name c
+    related_name_offsets int64[C+1] CSR offsets of each cluster's related_names, numbered after the C org names
+    names                utf-8 bytes
+"""
+import mmap
+import os
+import struct
+
+import numpy
+
+MAGIC = b'PDSNAP01'
+SECTIONS = (('website_ids', numpy.int64), ('website_clusters', numpy.int32), ('hash_slots', numpy.int32),
+            ('cluster_ids', numpy.int64), ('cluster_generic', numpy.uint8), ('member_offsets', numpy.int64),
+            ('name_offsets', numpy.int64), ('related_name_offsets', numpy.int64), ('names', numpy.uint8))
+HEADER = struct.Struct(f'<8sQ{2 * len(SECTIONS)}Q')
+
+
+def hash_slot(website_ranking_id, slot_bits):
+    # fibonacci hashing, the top slot_bits bits of the 64 bit product
+    # a numpy integer would overflow the multiplication, a Python int does not
+    website_ranking_id = int(website_ranking_id)
+    return ((website_ranking_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - slot_bits)
+
+
+def website_organizations_from_arrays(parents_dictionary, website_ranking_ids, successors):
+    """
+    Maps every website to the operating parent of its cluster, the loop parents left out of related_objects included.
+    Labelling the graph again needs construct_parents_dictionary, so only the process writing the snapshot imports it.
+
+    :param parents_dictionary: the parents_dictionary built from the arrays.
+    :param website_ranking_ids: the website_ranking_ids given to construct_parents_dictionary_from_arrays.
+    :param successors: the successors given to construct_parents_dictionary_from_arrays.
+    :return: a dictionary {website_ranking_id: operating parent id} for ParentsSnapshot.write.
+    """
+    from construct_parents_dictionary import ParentsDictProxy
+
+    cluster = ParentsDictProxy.label_functional_graph(successors)[2]
+    organizations = {website_ranking_id: operating_parent for operating_parent, entry in parents_dictionary.items()
+                     for website_ranking_id in entry['related_objects']}
+    cluster_organizations = {}
+    for position, cluster_id in enumerate(cluster):
+        if website_ranking_ids[position] in organizations:
+            cluster_organizations.setdefault(cluster_id, organizations[website_ranking_ids[position]])
+
+    return {website_ranking_ids[position]: cluster_organizations[cluster_id]
+            for position, cluster_id in enumerate(cluster)}
+
+
+class ParentsSnapshot:
+    """
+    A read only, memory-mapped view of a parents_dictionary written by ParentsSnapshot.write.
+    """
+
+    def __init__(self, snapshot_path):
+        with open(snapshot_path, 'rb') as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = HEADER.unpack_from(self._mmap, 0)
+        if header[0] != MAGIC:
+            raise ValueError(f"{snapshot_path} is not a parents dictionary snapshot")
+
+        # zero-copy numpy views over the mapped file
+        for section, (name, dtype) in enumerate(SECTIONS):
+            offset, length = header[2 + 2 * section], header[3 + 2 * section]
+            setattr(self, name, numpy.frombuffer(self._mmap, dtype=dtype, count=length, offset=offset))
+
+        self._slot_bits = len(self.hash_slots).bit_length() - 1
+
+    @staticmethod
+    def write(parents_dictionary, snapshot_path, website_organizations=None):
+        """
+        Writes the parents_dictionary to snapshot_path. The file is replaced atomically,
+        readers which already mapped the previous snapshot keep reading it until they reopen.
+
+        :param parents_dictionary: the parents_dictionary attribute of a ParentsDictProxy.
+        :param snapshot_path: path of the snapshot file.
+        :param website_organizations: optional {website_ranking_id: operating parent id} of every website,
+            the websites missing from related_objects are indexed too, see website_organizations_from_arrays.
+        """
+        website_ids, website_clusters, cluster_ids, cluster_generic = [], [], [], []
+        member_offsets, related_name_offsets = [0], [0]
+        org_names, related_names = [], []
+        for cluster, (operating_parent, entry) in enumerate(parents_dictionary.items()):
+            cluster_ids.append(operating_parent)
+            cluster_generic.append(bool(entry['generic_cluster']))
+            org_names.append(entry['org_website_ranking_name'])
+            for website_ranking_id in entry['related_objects']:
+                website_ids.append(website_ranking_id)
+                website_clusters.append(cluster)
+            member_offsets.append(len(website_ids))
+            related_names.extend(entry['related_names'])
+            related_name_offsets.append(len(related_names))
+
+        # websites outside every related_objects set come after the member lists, they only join the lookup table
+        if website_organizations is not None:
+            clusters_by_parent = {operating_parent: cluster for cluster, operating_parent in enumerate(cluster_ids)}
+            indexed_websites = set(website_ids)
+            for website_ranking_id, operating_parent in website_organizations.items():
+                if website_ranking_id not in indexed_websites:
+                    website_ids.append(website_ranking_id)
+                    website_clusters.append(clusters_by_parent[operating_parent])
+
+        slot_bits = max(1, (2 * len(website_ids)).bit_length())
+        hash_slots = numpy.full(1 << slot_bits, -1, dtype=numpy.int32)
+        slot_mask = (1 << slot_bits) - 1
+        for position, website_ranking_id in enumerate(website_ids):
+            slot = hash_slot(website_ranking_id, slot_bits)
+            while hash_slots[slot] != -1:
+                slot = (slot + 1) & slot_mask
+            hash_slots[slot] = position
+
+        encoded_names = [('' if name is None else str(name)).encode('utf-8') for name in org_names + related_names]
+        name_offsets = numpy.zeros(len(encoded_names) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(encoded_name) for encoded_name in encoded_names], out=name_offsets[1:])
+
+        arrays = {'website_ids': numpy.array(website_ids, dtype=numpy.int64),
+                  'website_clusters': numpy.array(website_clusters, dtype=numpy.int32),
+                  'hash_slots': hash_slots,
+                  'cluster_ids': numpy.array(cluster_ids, dtype=numpy.int64),
+                  'cluster_generic': numpy.array(cluster_generic, dtype=numpy.uint8),
+                  'member_offsets': numpy.array(member_offsets, dtype=numpy.int64),
+                  'name_offsets': name_offsets,
+                  'related_name_offsets': numpy.array(related_name_offsets, dtype=numpy.int64) + len(org_names),
+                  'names': numpy.frombuffer(b''.join(encoded_names), dtype=numpy.uint8)}
+
+        section_locations = []
+        offset = HEADER.size
+        for name, dtype in SECTIONS:
+            offset += -offset % 8
+            section_locations.extend([offset, len(arrays[name])])
+            offset += arrays[name].nbytes
+
+        temporary_path = f'{snapshot_path}.tmp'
+        with open(temporary_path, 'wb') as snapshot_file:
+            snapshot_file.write(HEADER.pack(MAGIC, len(SECTIONS), *section_locations))
+            for section, (name, dtype) in enumerate(SECTIONS):
+                snapshot_file.write(b'\0' * (section_locations[2 * section] - snapshot_file.tell()))
+                snapshot_file.write(arrays[name].astype(dtype, copy=False).tobytes())
+        os.replace(temporary_path, snapshot_path)
+
+    def close(self):
+        for name, dtype in SECTIONS:
+            setattr(self, name, None)
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.cluster_ids)
+
+    def _name(self, name_index):
+        start, end = self.name_offsets[name_index], self.name_offsets[name_index + 1]
+        return bytes(self.names[start:end]).decode('utf-8')
+
+    def _position(self, website_ranking_id):
+        slot_mask = len(self.hash_slots) - 1
+        slot = hash_slot(website_ranking_id, self._slot_bits)
+        while True:
+            position = self.hash_slots[slot]
+            if position == -1:
+                return None
+            if self.website_ids[position] == website_ranking_id:
+                return position
+            slot = (slot + 1) & slot_mask
+
+    def _cluster(self, website_ranking_id):
+        position = self._position(website_ranking_id)
+        return None if position is None else int(self.website_clusters[position])
+
+    def organization(self, website_ranking_id):
+        """
+        :return: the operating parent id (the parents_dictionary key) of the website, or None if it is unknown.
+        """
+        cluster = self._cluster(website_ranking_id)
+        return None if cluster is None else int(self.cluster_ids[cluster])
+
+    def __contains__(self, operating_parent):
+        cluster = self._cluster(operating_parent)
+        return cluster is not None and self.cluster_ids[cluster] == operating_parent
+
+    def __getitem__(self, operating_parent):
+        """
+        :return: the parents_dictionary entry of an operating parent, built from the snapshot.
+        """
+        cluster = self._cluster(operating_parent)
+        if cluster is None or self.cluster_ids[cluster] != operating_parent:
+            raise KeyError(operating_parent)
+
+        members = self.website_ids[self.member_offsets[cluster]:self.member_offsets[cluster + 1]]
+        related_names = range(self.related_name_offsets[cluster], self.related_name_offsets[cluster + 1])
+        return {'org_website_ranking_name': self._name(cluster),
+                'generic_cluster': bool(self.cluster_generic[cluster]),
+                'related_objects': set(members.tolist()),
+                'related_names': {self._name(name_index) for name_index in related_names}}
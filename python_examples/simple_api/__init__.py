@@ -4,17 +4,60 @@ Create a simple API endpoint 'whatup' that will take an input parameter of an in
 Add 5. Multiply 2, and return the result.
 Log each input and output result to a JSON file which is readable for the session.
 The input parameter should be validated and return an error if invalid.
+
+Importing simple_api does not import Flask: WhatUp and the log handlers only need the standard library.
+The Flask app is built by create_app(), or on first access of simple_api.app (e.g. for `flask run` or gunicorn).
 """
+import atexit
+import glob
+import gzip
+import heapq
 import os
 import json
+import logging
+import queue
+import shutil
+import struct
+import threading
+import time
 from datetime import datetime
 
-from flask import Flask, request, jsonify
+from .metrics import PROMETHEUS_CONTENT_TYPE, RequestMetrics
+
+# the same logger Flask's app.logger writes to
+logger = logging.getLogger(__name__)
+# with several workers set SIMPLE_API_METRICS_DIRECTORY so /metrics sums every worker's metrics
+request_metrics = RequestMetrics(directory=os.environ.get('SIMPLE_API_METRICS_DIRECTORY') or None)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=request_metrics.reset_after_fork)
+
+_lazy_attributes_lock = threading.Lock()
 
-app = Flask(__name__)
 
-now = datetime.now()
-session_timestamp = f'{now.strftime("%m-%d-%Y_%H.%M.%S")}'
+def get_session_timestamp():
+    """
+    The session starts the first time it is needed (the first log written or read), not when simple_api is imported.
+    Every worker of one deployment should share a session, set SIMPLE_API_SESSION_TIMESTAMP before starting them.
+    """
+    if 'session_timestamp' not in globals():
+        with _lazy_attributes_lock:
+            if 'session_timestamp' not in globals():
+                now = datetime.now()
+                globals()['session_timestamp'] = (os.environ.get('SIMPLE_API_SESSION_TIMESTAMP') or
+                                                  f'{now.strftime("%m-%d-%Y_%H.%M.%S")}')
+    return globals()['session_timestamp']
+
+
+def __getattr__(name):
+    # simple_api.app and simple_api.session_timestamp are made on first access, after which they are plain globals
+    if name == 'session_timestamp':
+        return get_session_timestamp()
+    if name == 'app':
+        with _lazy_attributes_lock:
+            if 'app' not in globals():
+                globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class WhatUp:
@@ -39,11 +82,25 @@ class WhatUp:
         try:
             input_integer = int(user_input)
             has_integer_syntax = True
-        except ValueError:
+        # a form posted without input-integer gives None
+        except (ValueError, TypeError):
             has_integer_syntax = False
 
         return has_integer_syntax
 
+    @staticmethod
+    def is_valid_batch_input(user_input):
+        """
+        Items of a json batch may be of any json type. Only an integer (not a boolean) or a string following the
+        syntax of an integer is valid, so e.g. null, 2.5, true, [2] or {"a": 1} are invalid items instead of errors.
+
+        :param user_input: a single item of a batch.
+        :return: boolean if the user_input is a valid integer input.
+        """
+        if type(user_input) is int:
+            return True
+        return type(user_input) is str and WhatUp.is_valid_input(user_input)
+
     @staticmethod
     def do_the_math(input_integer):
         """
@@ -77,11 +134,38 @@ class WhatUp:
 
         return run_dictionary
 
+    def run_batch(self, user_inputs):
+        """
+        Runs many user_inputs at once, the batch equivalent of run(self, user_input).
+        Inputs are validated first and the math is then done over all valid inputs in one pass.
+
+        :param user_inputs: a sequence of user_input values, strings or items of a json array.
+        :return: a list of run dictionaries in the same order as user_inputs, shaped like the ones from run().
+        """
+        valid_positions = [position for position, user_input in enumerate(user_inputs)
+                           if self.is_valid_batch_input(user_input)]
+        input_integers = [int(user_inputs[position]) for position in valid_positions]
+        output_integers = [self.do_the_math(input_integer) for input_integer in input_integers]
+
+        run_dictionaries = [None] * len(user_inputs)
+        for position, input_integer, output_integer in zip(valid_positions, input_integers, output_integers):
+            run_dictionaries[position] = {'input_integer': input_integer,
+                                          'output': output_integer,
+                                          }
+        for position, user_input in enumerate(user_inputs):
+            if run_dictionaries[position] is None:
+                run_dictionaries[position] = {'input_integer': user_input,
+                                              'error': 'input_integer is of wrong syntax. Please only enter digits '
+                                                       'and preceded them by a dash [-] to indicate a negative number.',
+                                              }
+
+        return run_dictionaries
+
 
 def main(user_input):
     """
     Creates a runnable instance for the WhatUp task, runs the instance with the user_input,
-    retrieves the response in the form of a dictionary, logs the dictionary into tmp/run_log.json as a local directory,
+    retrieves the response in the form of a dictionary, logs the dictionary into tmp/run_log.jsonl as a local directory,
     and returns the single run dictionary.
 
     To be used in the /whatup endpoint
@@ -89,60 +173,723 @@ def main(user_input):
     :return: run_dictionary from the single run as a result of calling the endpoint,
     """
     run_instance = WhatUp()
+    start = time.perf_counter()
     run_dictionary = run_instance.run(user_input)
-    log_run(run_dictionary, use_temp=True)
-    log_run(run_dictionary, use_temp=False)
+    request_metrics.observe_stage('whatup_run', time.perf_counter() - start)
+    request_metrics.observe_runs([run_dictionary])
+
+    # both logs are written by the background RunLogWriter so the request never waits on the disk
+    start = time.perf_counter()
+    run_log_writer.submit(run_dictionary)
+    request_metrics.observe_stage('log_submit', time.perf_counter() - start)
     return run_dictionary
 
 
+def main_batch(user_inputs):
+    """
+    The batch equivalent of main(user_input), every run of the batch is logged with a single write.
+
+    To be used in the /whatup_batch endpoint
+    :param user_inputs: a sequence of user_input values.
+    :return: the run dictionaries in the same order as user_inputs.
+    """
+    run_instance = WhatUp()
+    start = time.perf_counter()
+    run_dictionaries = run_instance.run_batch(user_inputs)
+    request_metrics.observe_stage('whatup_run', time.perf_counter() - start)
+    request_metrics.observe_runs(run_dictionaries)
+
+    start = time.perf_counter()
+    run_log_writer.submit_many(run_dictionaries)
+    request_metrics.observe_stage('log_submit', time.perf_counter() - start)
+    return run_dictionaries
+
+
 # begin handlers for the log file
+# a log is a directory of JSON Lines segments, one per process (e.g. per gunicorn worker) named by its pid.
+# A segment starts with a header line {"session_timestamp": ..., "created_at": ...} followed by one run dictionary
+# per line stamped with logged_at. Each process only ever appends to its own segment, so workers never share a
+# file or a lock, and reading merges the segments by logged_at.
+# Once a segment reaches the RunLogWriter's size or run cap it is closed: renamed to segment_<pid>.<n>.jsonl,
+# gzip compressed along with its index and recorded in the log's manifest.jsonl. Readers list the active and
+# closed segments together, so a rotated log reads exactly like one that was never rotated.
 def get_log_file_absolute_path(use_temp=True):
     current_directory = os.path.dirname(__file__)
     if use_temp:
-        relative_path = "tmp/run_log.json"
+        relative_path = "tmp/run_log"
     else:
-        relative_path = f"previous_sessions/run_log_{session_timestamp}.json"
+        relative_path = f"previous_sessions/run_log_{get_session_timestamp()}"
     absolute_path = os.path.join(current_directory, relative_path)
     return absolute_path
 
 
+def get_segment_absolute_path(absolute_path):
+    return os.path.join(absolute_path, f"segment_{os.getpid()}.jsonl")
+
+
+# every segment has a binary index with one fixed size record per run: logged_at, byte offset of the line,
+# input_integer and flags, so a filtered page is found without parsing any of the lines before it
+INDEX_RECORD = struct.Struct('<dqqB7x')
+INDEX_ERROR = 1
+INDEX_INPUT_INTEGER = 2
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def get_segment_index_path(segment_path):
+    if segment_path.endswith('.gz'):
+        return segment_path[:-len('.jsonl.gz')] + '.idx.gz'
+    return segment_path[:-len('.jsonl')] + '.idx'
+
+
+def get_manifest_path(absolute_path):
+    return os.path.join(absolute_path, 'manifest.jsonl')
+
+
+def open_log_file(path, mode='rb'):
+    # closed segments and their indexes are gzip compressed, both open the same way as the active ones
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8' if 't' in mode else None)
+    return open(path, mode, encoding='utf-8' if 't' in mode else None)
+
+
+def list_segments(absolute_path):
+    """
+    :param absolute_path: path of a log directory.
+    :return: the sorted paths of every active and closed segment of the log. A closed segment caught between
+             being compressed and its uncompressed copy being removed is listed once, compressed.
+    """
+    segment_paths = set(glob.glob(os.path.join(absolute_path, 'segment_*.jsonl')))
+    for compressed_path in glob.glob(os.path.join(absolute_path, 'segment_*.jsonl.gz')):
+        segment_paths.discard(compressed_path[:-len('.gz')])
+        segment_paths.add(compressed_path)
+    return sorted(segment_paths)
+
+
+def open_segment(segment_path, mode='rb'):
+    """
+    :return: a tuple (the opened segment file, the path actually opened), or None if the segment is gone.
+             A segment compressed since it was listed is opened compressed.
+    """
+    for path in (segment_path, segment_path + '.gz'):
+        try:
+            return open_log_file(path, mode), path
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def open_segments(absolute_path, mode='rb', skip_segment=None):
+    """
+    Opens every segment of a log and reads its header.
+
+    A segment rotated between being listed and opened is gone under its listed name, the log is then listed again
+    to open it under its closed name. A segment met under both names is opened once, recognized by its process
+    and the created_at of its header.
+
+    :param absolute_path: path of a log directory.
+    :param mode: 'rb' or 'rt'.
+    :param skip_segment: optional callable, a listed segment path for which it returns True is not opened.
+    :return: a list of (created_at, session_timestamp, opened segment file, path actually opened) tuples.
+    """
+    segments = []
+    listed_paths = set()
+    opened_segment_keys = set()
+    while True:
+        segment_missing = False
+        for segment_path in list_segments(absolute_path):
+            if segment_path in listed_paths or (skip_segment is not None and skip_segment(segment_path)):
+                continue
+            opened_segment = open_segment(segment_path, mode)
+            if opened_segment is None:
+                segment_missing = True
+                continue
+            listed_paths.add(segment_path)
+
+            segment_file, opened_path = opened_segment
+            try:
+                header = json.loads(segment_file.readline())
+                created_at, segment_session_timestamp = header['created_at'], header['session_timestamp']
+            except (json.decoder.JSONDecodeError, KeyError, TypeError):
+                segment_file.close()
+                continue
+            # segment_<pid>.jsonl and segment_<pid>.<n>.jsonl.gz share the process part of their name
+            segment_key = (os.path.basename(opened_path).split('.')[0], created_at)
+            if segment_key in opened_segment_keys:
+                segment_file.close()
+                continue
+            opened_segment_keys.add(segment_key)
+            segments.append((created_at, segment_session_timestamp, segment_file, opened_path))
+
+        if not segment_missing:
+            return segments
+
+
+def read_manifest(absolute_path):
+    """
+    :param absolute_path: path of a log directory.
+    :return: a dictionary of the closed segments still on disk, {segment file name: manifest entry}.
+    """
+    manifest = {}
+    try:
+        with open(get_manifest_path(absolute_path), 'r', encoding='utf-8') as manifest_file:
+            for line in manifest_file:
+                try:
+                    entry = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    continue
+                if 'removed_at' in entry:
+                    manifest.pop(entry['segment'], None)
+                else:
+                    manifest[entry['segment']] = entry
+    except FileNotFoundError:
+        pass
+    return manifest
+
+
+def append_to_manifest(absolute_path, entry):
+    # one short line per append, every process can add to the manifest without a lock
+    with open(get_manifest_path(absolute_path), 'a', encoding='utf-8') as manifest_file:
+        manifest_file.write(json.dumps(entry) + '\n')
+
+
+def rotate_segment(absolute_path, compresslevel=6):
+    """
+    Closes this process's active segment of a log: renames it, gzip compresses it and its index,
+    and records it in the manifest. The next append starts a new active segment.
+
+    :param absolute_path: path of a log directory.
+    :param compresslevel: gzip compression level of the closed segment.
+    :return: the manifest entry of the closed segment, or None if there was no active segment.
+    """
+    segment_path = get_segment_absolute_path(absolute_path)
+    if not os.path.exists(segment_path):
+        return None
+
+    process_id = os.getpid()
+    closed_numbers = [int(os.path.basename(path).split('.')[1])
+                      for path in glob.glob(os.path.join(absolute_path, f'segment_{process_id}.*.jsonl*'))]
+    closed_path = os.path.join(absolute_path, f'segment_{process_id}.{max(closed_numbers, default=0) + 1}.jsonl')
+    closed_index_path = get_segment_index_path(closed_path)
+    os.replace(segment_path, closed_path)
+    if os.path.exists(get_segment_index_path(segment_path)):
+        os.replace(get_segment_index_path(segment_path), closed_index_path)
+    else:
+        open(closed_index_path, 'wb').close()
+
+    with open(closed_path, 'rb') as closed_file:
+        header = json.loads(closed_file.readline())
+    with open(closed_index_path, 'rb') as index_file:
+        first_record = index_file.read(INDEX_RECORD.size)
+        index_file.seek(0, os.SEEK_END)
+        run_count = index_file.tell() // INDEX_RECORD.size
+        index_file.seek(max(0, run_count - 1) * INDEX_RECORD.size)
+        last_record = index_file.read(INDEX_RECORD.size)
+
+    # the index is compressed first, so a reader finding the compressed segment always finds its index
+    for path in (closed_index_path, closed_path):
+        with open(path, 'rb') as source_file, \
+                gzip.open(path + '.gz.tmp', 'wb', compresslevel=compresslevel) as compressed_file:
+            shutil.copyfileobj(source_file, compressed_file)
+        os.replace(path + '.gz.tmp', path + '.gz')
+    entry = {'segment': os.path.basename(closed_path) + '.gz',
+             'process_id': process_id,
+             'session_timestamp': header['session_timestamp'],
+             'created_at': header['created_at'],
+             'closed_at': time.time(),
+             'runs': run_count,
+             'first_logged_at': INDEX_RECORD.unpack(first_record)[0] if run_count else None,
+             'last_logged_at': INDEX_RECORD.unpack(last_record)[0] if run_count else None,
+             'bytes': os.path.getsize(closed_path),
+             'compressed_bytes': os.path.getsize(closed_path + '.gz') + os.path.getsize(closed_index_path + '.gz')}
+    os.remove(closed_path)
+    os.remove(closed_index_path)
+
+    append_to_manifest(absolute_path, entry)
+    return entry
+
+
+def remove_closed_segments(absolute_path, max_closed_bytes):
+    """
+    Removes the oldest closed segments of a log, whichever process closed them (including exited or recycled
+    workers), until the rest take at most max_closed_bytes.
+
+    Several processes may remove at once, a segment already removed by another one is left to it.
+
+    :return: the file names of the segments removed by this call.
+    """
+    closed_segments = []
+    for path in glob.glob(os.path.join(absolute_path, 'segment_*.*.jsonl.gz')):
+        try:
+            closed_segments.append((os.path.getmtime(path), path,
+                                    os.path.getsize(path) + os.path.getsize(get_segment_index_path(path))))
+        except FileNotFoundError:
+            continue
+    # closed segments are never written again, so the time of their last change is the time they were closed
+    closed_segments.sort()
+
+    removed_segments = []
+    total_bytes = sum(closed_bytes for _, _, closed_bytes in closed_segments)
+    for _, path, closed_bytes in closed_segments:
+        if total_bytes <= max_closed_bytes:
+            break
+        total_bytes -= closed_bytes
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        try:
+            os.remove(get_segment_index_path(path))
+        except FileNotFoundError:
+            pass
+        removed_segments.append(os.path.basename(path))
+        append_to_manifest(absolute_path, {'segment': os.path.basename(path), 'removed_at': time.time()})
+    return removed_segments
+
+
 def log_run(run_dictionary, use_temp=True):
-    absolute_path = get_log_file_absolute_path(use_temp=use_temp)
-    log_content_dict = read_log_file(absolute_path)
+    """
+    Queues a run for one log. Like every other run it is appended by run_log_writer, the only writer of the
+    process's segments, call run_log_writer.flush() to wait until it is written.
+    """
+    run_log_writer.submit_many([run_dictionary], use_temps=(use_temp,))
+
 
-    log_content_dict['run_log'].append(run_dictionary)
-    mode = 'w' if os.path.exists(absolute_path) else 'r+'
-    with open(absolute_path, mode, encoding='utf-8') as log_file:
-        log_file.write(json.dumps(log_content_dict, indent=4))
+def encode_log_lines(timed_runs):
+    """
+    Serializes runs once so the same bytes can be appended to several logs.
+
+    :param timed_runs: a sequence of (logged_at, run_dictionary) tuples.
+    :return: a tuple (the encoded lines, an (line_length, logged_at, input_integer, flags) tuple per line).
+    """
+    encoded_lines = []
+    index_entries = []
+    for logged_at, run_dictionary in timed_runs:
+        encoded_line = (json.dumps(dict(run_dictionary, logged_at=logged_at)) + '\n').encode('utf-8')
+        encoded_lines.append(encoded_line)
+
+        flags, input_integer = 0, 0
+        if 'error' in run_dictionary:
+            flags |= INDEX_ERROR
+        elif type(run_dictionary['input_integer']) is int and INT64_MIN <= run_dictionary['input_integer'] <= INT64_MAX:
+            flags |= INDEX_INPUT_INTEGER
+            input_integer = run_dictionary['input_integer']
+        index_entries.append((len(encoded_line), logged_at, input_integer, flags))
+
+    return b''.join(encoded_lines), index_entries
+
+
+def append_to_segment(absolute_path, encoded_log_lines, fsync=False):
+    """
+    Appends encoded lines to this process's active segment of a log and their records to its index.
+
+    :return: a tuple (size of the segment in bytes, number of runs in the segment).
+    """
+    encoded_lines, index_entries = encoded_log_lines
+    segment_path = get_segment_absolute_path(absolute_path)
+    if not os.path.exists(segment_path):
+        os.makedirs(absolute_path, exist_ok=True)
+        header = json.dumps({'session_timestamp': get_session_timestamp(), 'created_at': time.time()}) + '\n'
+        encoded_lines = header.encode('utf-8') + encoded_lines
+        index_entries = [(len(header.encode('utf-8')), None, 0, 0)] + index_entries
+
+    with open(segment_path, 'ab') as log_file:
+        log_file.seek(0, os.SEEK_END)
+        offset = log_file.tell()
+        log_file.write(encoded_lines)
+        if fsync:
+            log_file.flush()
+            os.fsync(log_file.fileno())
+
+    # the index is appended after the lines it points at, so a reader never follows it to a missing line
+    index_records = bytearray()
+    for line_length, logged_at, input_integer, flags in index_entries:
+        if logged_at is not None:
+            index_records += INDEX_RECORD.pack(logged_at, offset, input_integer, flags)
+        offset += line_length
+
+    with open(get_segment_index_path(segment_path), 'ab') as index_file:
+        index_file.write(index_records)
+        if fsync:
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        run_count = index_file.tell() // INDEX_RECORD.size
+
+    return offset, run_count
 
 
 def clear_log_file(absolute_path):
     blank_log = {'run_log': [],
-                 'session_timestamp': session_timestamp}
-    mode = 'w+'
-    with open(absolute_path, mode, encoding='utf-8') as log_file:
-        log_file.truncate()
-        log_file.write(json.dumps(blank_log, indent=4))
+                 'session_timestamp': get_session_timestamp()}
+    os.makedirs(absolute_path, exist_ok=True)
+    for path in glob.glob(os.path.join(absolute_path, 'segment_*')) + [get_manifest_path(absolute_path)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
 
     return blank_log
 
 
-def read_log_file(absolute_path):
-    mode = 'r' if os.path.exists(absolute_path) else 'w+'
-    with open(absolute_path, mode, encoding='utf-8') as log_file:
-        log_content = log_file.read()
+def iterate_log_file(absolute_path):
+    """
+    Streams a log without loading it, merging the segments of every process by logged_at.
+
+    :param absolute_path: path of a log directory.
+    :return: a tuple (session_timestamp of the oldest segment, generator of run dictionaries).
+    """
+    segments = open_segments(absolute_path, 'rt')
+
+    log_session_timestamp = get_session_timestamp()
+    if segments:
+        log_session_timestamp = min(segments, key=lambda segment: segment[0])[1]
+
+    def iterate_segment(segment_file):
+        with segment_file:
+            for line in segment_file:
+                # a line still being written by another process (or cut short by a crash) is skipped
+                try:
+                    run_dictionary = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    continue
+                yield run_dictionary.pop('logged_at', 0), run_dictionary
+
+    def iterate_runs():
+        timed_runs = heapq.merge(*(iterate_segment(segment_file) for _, _, segment_file, _ in segments),
+                                 key=lambda timed_run: timed_run[0])
+        for _, run_dictionary in timed_runs:
+            yield run_dictionary
+
+    return log_session_timestamp, iterate_runs()
 
-    try:
-        log_content_dict = json.loads(log_content)
-    except json.decoder.JSONDecodeError:
-        blank_log = clear_log_file(absolute_path)
-        log_content_dict = blank_log
+
+def query_log_file(absolute_path, offset=0, limit=None, errors_only=False, input_min=None, input_max=None,
+                   logged_after=None, logged_before=None):
+    """
+    Finds one page of a filtered log using the segment indexes, only the lines of the page are read and parsed.
+
+    :param absolute_path: path of a log directory.
+    :param offset: number of matching runs to skip.
+    :param limit: maximum number of runs to return, at least 1, None for all of them.
+    :param errors_only: only runs which returned an error.
+    :param input_min: only valid runs with input_integer >= input_min.
+    :param input_max: only valid runs with input_integer <= input_max.
+    :param logged_after: only runs logged at or after this unix timestamp.
+    :param logged_before: only runs logged before this unix timestamp.
+    :return: a tuple (session_timestamp, generator of run dictionaries, page) where page['next_offset'] is set
+             once the generator is exhausted, to the offset of the next page or None if this is the last page.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError('limit must be at least 1.')
+
+    manifest = read_manifest(absolute_path)
+
+    def is_outside_window(segment_path):
+        # a closed segment entirely outside the since/until window is not opened at all
+        entry = manifest.get(os.path.basename(segment_path))
+        return entry is not None and bool(entry['runs']) and (
+            (logged_after is not None and entry['last_logged_at'] < logged_after) or
+            (logged_before is not None and entry['first_logged_at'] >= logged_before))
+
+    segments = open_segments(absolute_path, 'rb', skip_segment=is_outside_window)
+
+    log_session_timestamp = get_session_timestamp()
+    if segments:
+        log_session_timestamp = min(segments, key=lambda segment: segment[0])[1]
+    filter_inputs = input_min is not None or input_max is not None
+    page = {'next_offset': None}
+
+    def iterate_index(segment_number, segment_path):
+        try:
+            index_file = open_log_file(get_segment_index_path(segment_path), 'rb')
+        except FileNotFoundError:
+            return
+        with index_file:
+            while True:
+                chunk = index_file.read(INDEX_RECORD.size * 4096)
+                # a record still being appended is left for the next read
+                for logged_at, line_offset, input_integer, flags in INDEX_RECORD.iter_unpack(
+                        chunk[:len(chunk) - len(chunk) % INDEX_RECORD.size]):
+                    yield logged_at, line_offset, input_integer, flags, segment_number
+                if len(chunk) < INDEX_RECORD.size * 4096:
+                    return
+
+    def read_run(segment_number, line_offset):
+        segment_file = segments[segment_number][2]
+        # offsets only move forward within a segment, so seeking a compressed segment never rewinds it
+        segment_file.seek(line_offset)
+        try:
+            return json.loads(segment_file.readline())
+        except json.decoder.JSONDecodeError:
+            return None
+
+    def input_in_range(input_integer):
+        return (input_min is None or input_integer >= input_min) and (input_max is None or input_integer <= input_max)
+
+    def iterate_page():
+        matched = 0
+        try:
+            records = heapq.merge(*(iterate_index(segment_number, segment[3])
+                                    for segment_number, segment in enumerate(segments)),
+                                  key=lambda record: record[0])
+            for logged_at, line_offset, input_integer, flags, segment_number in records:
+                if logged_after is not None and logged_at < logged_after:
+                    continue
+                if logged_before is not None and logged_at >= logged_before:
+                    continue
+                if errors_only and not flags & INDEX_ERROR:
+                    continue
+
+                run_dictionary = None
+                if filter_inputs:
+                    if flags & INDEX_ERROR:
+                        continue
+                    if flags & INDEX_INPUT_INTEGER:
+                        if not input_in_range(input_integer):
+                            continue
+                    else:
+                        # an input too large for the index is compared on the parsed line
+                        run_dictionary = read_run(segment_number, line_offset)
+                        if run_dictionary is None or not input_in_range(run_dictionary['input_integer']):
+                            continue
+
+                matched += 1
+                if matched <= offset:
+                    continue
+                if limit is not None and matched > offset + limit:
+                    page['next_offset'] = offset + limit
+                    return
+
+                if run_dictionary is None:
+                    run_dictionary = read_run(segment_number, line_offset)
+                if run_dictionary is not None:
+                    run_dictionary.pop('logged_at', None)
+                    yield run_dictionary
+        finally:
+            for segment in segments:
+                segment[2].close()
+
+    return log_session_timestamp, iterate_page(), page
+
+
+def read_log_file(absolute_path):
+    log_session_timestamp, run_log = iterate_log_file(absolute_path)
+    log_content_dict = {'run_log': list(run_log),
+                        'session_timestamp': log_session_timestamp}
 
     return log_content_dict
 
 
-# begin defining endpoints for the Flask app
-@app.route('/', methods=['GET'])
+def stream_log_file(absolute_path):
+    """
+    Yields the log as the same JSON document read_log_file would return, one run at a time.
+    Keys are sorted as flask.jsonify sorts them.
+    """
+    log_session_timestamp, run_log = iterate_log_file(absolute_path)
+
+    yield '{"run_log": ['
+    for run_number, run_dictionary in enumerate(run_log):
+        yield (', ' if run_number else '') + json.dumps(run_dictionary, sort_keys=True)
+    yield '], "session_timestamp": ' + json.dumps(log_session_timestamp) + '}\n'
+
+
+class RunLogWriter:
+    """
+    Writes run dictionaries to the temp and previous session logs from a single background thread.
+
+    Requests put runs on a bounded queue (blocking only when it is full) and the writer appends them in batches,
+    either once batch_size submissions are waiting or flush_interval seconds after the first one arrived.
+    Only this thread touches the process's log segments, so concurrent requests cannot interleave their writes.
+
+    fsync_policy decides when the written batch is forced to disk:
+        - 'never': leave it to the operating system (default)
+        - 'batch': after every batch
+        - 'interval': at most once every fsync_interval seconds
+
+    A segment is rotated (closed and compressed) once it holds max_segment_bytes or max_segment_runs,
+    so no single file grows for the life of the process. Once the closed segments of a log (of every process)
+    take more than max_closed_bytes on disk, the oldest ones are removed, so each log directory stays bounded at
+    about max_closed_bytes plus one active segment per process. max_closed_bytes=None keeps every closed segment.
+    """
+
+    _stop = object()
+
+    def __init__(self, max_queue_size=10000, batch_size=256, flush_interval=0.05, fsync_policy='never',
+                 fsync_interval=1.0, max_segment_bytes=16 * 2 ** 20, max_segment_runs=None,
+                 max_closed_bytes=256 * 2 ** 20):
+        if fsync_policy not in ('never', 'batch', 'interval'):
+            raise ValueError(f"Unknown fsync_policy: {fsync_policy}. "
+                             f"Valid policies are 'never', 'batch' and 'interval'")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_runs = max_segment_runs
+        self.max_closed_bytes = max_closed_bytes
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='run-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def submit(self, run_dictionary):
+        self.submit_many([run_dictionary])
+
+    def submit_many(self, run_dictionaries, block=True, use_temps=(True, False)):
+        """
+        :param run_dictionaries: runs which stay one queue item, so they are always appended in the same write.
+        :param block: wait for room when the queue is full, otherwise raise queue.Full.
+        :param use_temps: the logs to write the runs to, see get_log_file_absolute_path. Both by default.
+        """
+        if self._thread is None:
+            self.start()
+        self._queue.put((time.time(), run_dictionaries, tuple(use_temps)), block=block)
+
+    def flush(self):
+        """
+        Blocks until every run submitted before the call is written. Runs submitted meanwhile are not waited for,
+        so a flush returns under steady traffic instead of waiting for the queue to be empty.
+        """
+        if self._thread is not None:
+            # the writer sets the marker once the batch it was queued behind is written
+            flushed = threading.Event()
+            self._queue.put(flushed)
+            flushed.wait()
+
+    def close(self):
+        """
+        Writes everything still queued and stops the thread, called at interpreter shutdown.
+        """
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(self._stop)
+            thread.join()
+            # a flush which queued its marker behind the stop would otherwise wait forever
+            while True:
+                try:
+                    submitted = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(submitted, threading.Event):
+                    submitted.set()
+            atexit.unregister(self.close)
+
+    def reset_after_fork(self):
+        # a forked worker starts its own writer thread, the parent's thread and queue do not exist in the child
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not self._stop:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            submissions = [submitted for submitted in batch if type(submitted) is tuple]
+            try:
+                if submissions:
+                    self._write(submissions)
+            except Exception:
+                logger.exception(f"Failed to write {len(submissions)} submissions to the run logs")
+            finally:
+                for submitted in batch:
+                    if isinstance(submitted, threading.Event):
+                        submitted.set()
+
+            if batch[-1] is self._stop:
+                return
+
+    def _write(self, submissions):
+        fsync = self.fsync_policy == 'batch' or (self.fsync_policy == 'interval' and
+                                                 time.monotonic() - self._last_fsync >= self.fsync_interval)
+        # serialized once per set of submissions, so runs sent to both logs are encoded once
+        encoded_log_lines_by_submissions = {}
+        for use_temp in (True, False):
+            log_submissions = tuple(submission_number for submission_number, (_, _, use_temps)
+                                    in enumerate(submissions) if use_temp in use_temps)
+            if not log_submissions:
+                continue
+            if log_submissions not in encoded_log_lines_by_submissions:
+                encoded_log_lines_by_submissions[log_submissions] = encode_log_lines(
+                    [(submissions[submission_number][0], run_dictionary) for submission_number in log_submissions
+                     for run_dictionary in submissions[submission_number][1]])
+            encoded_log_lines = encoded_log_lines_by_submissions[log_submissions]
+
+            absolute_path = get_log_file_absolute_path(use_temp=use_temp)
+            start = time.perf_counter()
+            segment_bytes, segment_runs = append_to_segment(absolute_path, encoded_log_lines, fsync=fsync)
+            request_metrics.observe_stage('log_write', time.perf_counter() - start)
+            if ((self.max_segment_bytes is not None and segment_bytes >= self.max_segment_bytes) or
+                    (self.max_segment_runs is not None and segment_runs >= self.max_segment_runs)):
+                start = time.perf_counter()
+                rotate_segment(absolute_path)
+                if self.max_closed_bytes is not None:
+                    remove_closed_segments(absolute_path, self.max_closed_bytes)
+                request_metrics.observe_stage('log_rotate', time.perf_counter() - start)
+        if fsync:
+            self._last_fsync = time.monotonic()
+
+
+run_log_writer = RunLogWriter()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=run_log_writer.reset_after_fork)
+
+
+def stream_log_page(absolute_path, **query):
+    """
+    Yields one page of the log as JSON, shaped like read_log_file's dictionary plus next_offset.
+
+    :param query: the filters and pagination of query_log_file.
+    """
+    log_session_timestamp, run_log, page = query_log_file(absolute_path, **query)
+
+    yield '{"run_log": ['
+    for run_number, run_dictionary in enumerate(run_log):
+        yield (', ' if run_number else '') + json.dumps(run_dictionary, sort_keys=True)
+    yield ('], "session_timestamp": ' + json.dumps(log_session_timestamp) +
+           ', "next_offset": ' + json.dumps(page['next_offset']) + '}\n')
+
+
+def parse_log_query(arguments):
+    """
+    Turns the /get_log query parameters into query_log_file keyword arguments.
+
+    :param arguments: a mapping of query parameter names to string values.
+    :return: a dictionary of keyword arguments for query_log_file.
+    """
+    try:
+        query = {'offset': int(arguments.get('offset', 0)),
+                 'limit': int(arguments['limit']) if 'limit' in arguments else None,
+                 'errors_only': arguments.get('errors_only', '').lower() in ('1', 'true', 'yes'),
+                 'input_min': int(arguments['input_min']) if 'input_min' in arguments else None,
+                 'input_max': int(arguments['input_max']) if 'input_max' in arguments else None,
+                 'logged_after': float(arguments['since']) if 'since' in arguments else None,
+                 'logged_before': float(arguments['until']) if 'until' in arguments else None}
+    except ValueError:
+        raise ValueError('offset, limit, input_min and input_max must be integers, since and until unix timestamps.')
+    if query['offset'] < 0:
+        raise ValueError('offset can not be negative.')
+    # an empty page would point next_offset back at itself and a client following it would never stop
+    if query['limit'] is not None and query['limit'] < 1:
+        raise ValueError('limit must be at least 1.')
+
+    return query
+
+
+# begin defining the pages, they are plain functions shared by the Flask and ASGI apps
 def home():
     return '''
     <h1 id="everytown-python-skills-rest-api-endpoint">WhatUp REST API endpoint</h1>
@@ -163,7 +910,6 @@ def home():
     '''
 
 
-@app.route('/about', methods=['GET'])
 def about():
     return '''
     <h1 id="usage-guide">Usage Guide for whatup endpoint</h1>
@@ -175,26 +921,76 @@ def about():
     <p>The \whatup endpoint will return an error message if the input integer is not valid.</p>
     <h2 id="whatup-run-logs">Run log for all inputs and response in current run instance:</h2>
     <p>GET \get_log to see the run log for the current run instance as a json.</p>
+    <p>The log can be paged with the query parameters offset and limit (the response then holds next_offset, null on the last page) and filtered with errors_only=true, input_min, input_max and a since/until window in unix seconds.</p>
+    <h2 id="metrics">Metrics:</h2>
+    <p>GET /metrics for request counts, latency histograms, the share of invalid inputs and the time spent running versus logging, in the Prometheus text format.</p>
+    <h2 id="running-whatup-batch">Running many inputs via the batch endpoint:</h2>
+    <p>Post a json array of input integers (or one input integer per line as plain text) to the /whatup_batch endpoint. The response is a json array with one result per input, in the same order, each shaped like the /whatup response.</p>
     <form action = "/" >
         <input type = "submit" row = "Return Home" / >
     </form >
     '''
 
 
-@app.route('/whatup', methods=['POST'])
-def whatup():
-    user_input = request.form.get('input-integer')
-    run_dictionary = main(user_input)
-    return jsonify(run_dictionary)
+def create_app():
+    """
+    Builds the Flask app with every endpoint. Flask is imported here, so only the callers serving the API pay for it.
+
+    :return: a Flask app.
+    """
+    from flask import Flask, Response, g, jsonify, request
+
+    flask_app = Flask(__name__)
+    flask_app.add_url_rule('/', 'home', home, methods=['GET'])
+    flask_app.add_url_rule('/about', 'about', about, methods=['GET'])
+
+    @flask_app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @flask_app.after_request
+    def record_request_metrics(response):
+        # a streamed /get_log is measured up to its first byte, the rest is sent after this hook
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_metrics.observe_request(route, request.method, response.status_code,
+                                        time.perf_counter() - g.request_start)
+        return response
+
+    @flask_app.route('/whatup', methods=['POST'])
+    def whatup():
+        user_input = request.form.get('input-integer')
+        run_dictionary = main(user_input)
+        return jsonify(run_dictionary)
+
+    @flask_app.route('/whatup_batch', methods=['POST'])
+    def whatup_batch():
+        if request.is_json:
+            user_inputs = request.get_json(silent=True)
+            if not isinstance(user_inputs, list):
+                return jsonify({'error': 'Please post a json array of input integers.'}), 400
+        else:
+            user_inputs = [line.strip() for line in request.get_data(as_text=True).splitlines() if line.strip()]
+
+        run_dictionaries = main_batch(user_inputs)
+        return jsonify(run_dictionaries)
 
+    @flask_app.route('/get_log', methods=['GET'])
+    def get_log():
+        # runs still queued for the writer are part of the log the caller expects to see
+        run_log_writer.flush()
+        absolute_path = get_log_file_absolute_path(use_temp=True)
+        if not request.args:
+            return Response(stream_log_file(absolute_path), mimetype='application/json')
+
+        try:
+            query = parse_log_query(request.args)
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
 
-@app.route('/get_log', methods=['GET'])
-def get_log():
-    absolute_path = get_log_file_absolute_path(use_temp=True)
-    log_dict = read_log_file(absolute_path)
-    return jsonify(log_dict)
+        return Response(stream_log_page(absolute_path, **query), mimetype='application/json')
 
+    @flask_app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        return Response(request_metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
 
-if __name__ == "__main__":
-    clear_log_file(get_log_file_absolute_path(use_temp=True))
-    app.run(debug=True)
+    return flask_app
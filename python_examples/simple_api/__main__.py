@@ -0,0 +1,10 @@
+"""
+Runs the simple_api Flask app with the development server, starting from an empty temp run log.
+Run from the python_examples directory:
+    python -m simple_api
+"""
+from . import clear_log_file, create_app, get_log_file_absolute_path
+
+if __name__ == "__main__":
+    clear_log_file(get_log_file_absolute_path(use_temp=True))
+    create_app().run(debug=True)
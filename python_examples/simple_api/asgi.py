@@ -0,0 +1,270 @@
+"""
+An asyncio (ASGI) flavor of the simple_api Flask app with the same routes: /, /about, /whatup, /whatup_batch,
+/get_log and /metrics. It reuses WhatUp and the log handlers of simple_api, so both flavors read and write
+the same logs.
+
+The math is done on the event loop, handing runs to the RunLogWriter never waits on the disk
+(only on a full queue, which is then awaited in a thread), and reading the log for /get_log is done in a thread
+a few hundred lines at a time, so one slow disk never blocks the other connections.
+
+It is a plain ASGI callable without framework dependencies and runs under any ASGI server, e.g.:
+    uvicorn simple_api.asgi:app
+
+A local comparison against the Flask app (both driven in-process with the same concurrency):
+    python -m simple_api.asgi --requests 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import email.parser
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from . import (WhatUp, about, create_app, get_log_file_absolute_path, home, parse_log_query, request_metrics,
+               run_log_writer, stream_log_file, stream_log_page)
+from .metrics import PROMETHEUS_CONTENT_TYPE
+
+
+async def submit_runs(run_dictionaries):
+    start = time.perf_counter()
+    try:
+        run_log_writer.submit_many(run_dictionaries, block=False)
+    except queue.Full:
+        await asyncio.get_running_loop().run_in_executor(None, run_log_writer.submit_many, run_dictionaries)
+    request_metrics.observe_stage('log_submit', time.perf_counter() - start)
+
+
+def run_whatup(run_function, user_input):
+    start = time.perf_counter()
+    run_result = run_function(user_input)
+    request_metrics.observe_stage('whatup_run', time.perf_counter() - start)
+    request_metrics.observe_runs(run_result if isinstance(run_result, list) else [run_result])
+    return run_result
+
+
+async def iterate_in_executor(blocking_generator, batch_size=256):
+    """
+    Drains a blocking generator in the default executor, batch_size items per hop to the thread.
+    """
+    def next_batch():
+        batch = []
+        for item in blocking_generator:
+            batch.append(item)
+            if len(batch) == batch_size:
+                break
+        return batch
+
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await loop.run_in_executor(None, next_batch)
+        for item in batch:
+            yield item
+        if len(batch) < batch_size:
+            return
+
+
+def parse_form(content_type, body):
+    """
+    Parses an application/x-www-form-urlencoded or multipart/form-data body into a {name: value} dictionary.
+    Bytes which are not valid UTF-8 are replaced, as werkzeug decodes the form of the Flask app.
+    """
+    if content_type.startswith('multipart/form-data'):
+        message = email.parser.BytesParser().parsebytes(b'Content-Type: ' + content_type.encode('latin-1') +
+                                                        b'\r\n\r\n' + body)
+        return {part.get_param('name', header='content-disposition'):
+                part.get_payload(decode=True).decode('utf-8', errors='replace')
+                for part in message.get_payload() if part.get_param('name', header='content-disposition')}
+    return {name: values[0] for name, values in parse_qs(body.decode('utf-8', errors='replace')).items()}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_response(send, status, body, content_type='application/json'):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode('latin-1'))]})
+    await send({'type': 'http.response.body', 'body': body.encode('utf-8')})
+
+
+async def send_json(send, status, content):
+    # sorted keys, as flask.jsonify returns them
+    await send_response(send, status, json.dumps(content, sort_keys=True) + '\n')
+
+
+async def whatup(body, content_type):
+    user_input = parse_form(content_type, body).get('input-integer')
+    run_dictionary = run_whatup(WhatUp().run, user_input)
+    await submit_runs([run_dictionary])
+    return 200, run_dictionary
+
+
+async def whatup_batch(body, content_type):
+    if content_type.startswith('application/json'):
+        try:
+            user_inputs = json.loads(body)
+        except ValueError:
+            user_inputs = None
+        if not isinstance(user_inputs, list):
+            return 400, {'error': 'Please post a json array of input integers.'}
+    else:
+        user_inputs = [line.strip() for line in body.decode('utf-8', errors='replace').splitlines() if line.strip()]
+
+    run_dictionaries = run_whatup(WhatUp().run_batch, user_inputs)
+    await submit_runs(run_dictionaries)
+    return 200, run_dictionaries
+
+
+async def get_log(send, query_string):
+    loop = asyncio.get_running_loop()
+    # runs still queued for the writer are part of the log the caller expects to see
+    await loop.run_in_executor(None, run_log_writer.flush)
+    absolute_path = get_log_file_absolute_path(use_temp=True)
+
+    arguments = {name: values[0] for name, values in parse_qs(query_string.decode('latin-1')).items()}
+    if arguments:
+        try:
+            log_pieces = stream_log_page(absolute_path, **parse_log_query(arguments))
+        except ValueError as error:
+            await send_json(send, 400, {'error': str(error)})
+            return
+    else:
+        log_pieces = stream_log_file(absolute_path)
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'application/json')]})
+    async for log_piece in iterate_in_executor(log_pieces):
+        await send({'type': 'http.response.body', 'body': log_piece.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # write everything still queued before the server exits
+            await asyncio.get_running_loop().run_in_executor(None, run_log_writer.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    path, method = scope['path'], scope['method']
+    headers = dict(scope.get('headers', []))
+    content_type = headers.get(b'content-type', b'').decode('latin-1')
+    start = time.perf_counter()
+    response_status = []
+
+    async def send_and_record(message):
+        if message['type'] == 'http.response.start':
+            response_status.append(message['status'])
+        await send(message)
+
+    try:
+        await route(path, method, content_type, receive, send_and_record, scope)
+    finally:
+        # unlike the Flask hook, a streamed /get_log is measured until its last byte was sent,
+        # and a request failing before its response started is counted as the 500 the server answers
+        request_metrics.observe_request(path if response_status and response_status[0] != 404 else 'unmatched',
+                                        method, response_status[0] if response_status else 500,
+                                        time.perf_counter() - start)
+
+
+async def route(path, method, content_type, receive, send, scope):
+    if path == '/' and method == 'GET':
+        await send_response(send, 200, home(), content_type='text/html; charset=utf-8')
+    elif path == '/about' and method == 'GET':
+        await send_response(send, 200, about(), content_type='text/html; charset=utf-8')
+    elif path == '/whatup' and method == 'POST':
+        status, content = await whatup(await read_body(receive), content_type)
+        await send_json(send, status, content)
+    elif path == '/whatup_batch' and method == 'POST':
+        status, content = await whatup_batch(await read_body(receive), content_type)
+        await send_json(send, status, content)
+    elif path == '/get_log' and method == 'GET':
+        await get_log(send, scope.get('query_string', b''))
+    elif path == '/metrics' and method == 'GET':
+        await send_response(send, 200, request_metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+    else:
+        await send_json(send, 404, {'error': f'No route for {method} {path}'})
+
+
+async def call_asgi(path, method='GET', body=b'', content_type='application/x-www-form-urlencoded'):
+    """
+    Calls the ASGI app in-process, the way a server would, and returns (status, body bytes).
+    """
+    path, _, query_string = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string.encode('latin-1'),
+             'headers': [(b'content-type', content_type.encode('latin-1'))]}
+    response = {'status': None, 'body': b''}
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            response['body'] += message.get('body', b'')
+
+    await app(scope, receive, send)
+    return response['status'], response['body']
+
+
+def compare_with_flask(request_count, concurrency):
+    """
+    Sends the same /whatup requests to both apps in-process and returns the requests per second of each.
+    The ASGI app is driven by concurrent coroutines and the Flask app by a thread per concurrent request,
+    which is how each would be served by uvicorn and a threaded WSGI server respectively.
+    """
+    user_inputs = [str(number) if number % 10 else 'not a number' for number in range(request_count)]
+
+    async def drive_asgi():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def post(user_input):
+            async with semaphore:
+                await call_asgi('/whatup', method='POST', body=f'input-integer={user_input}'.encode('utf-8'))
+
+        await asyncio.gather(*(post(user_input) for user_input in user_inputs))
+
+    start = time.perf_counter()
+    asyncio.run(drive_asgi())
+    run_log_writer.flush()
+    asgi_seconds = time.perf_counter() - start
+
+    flask_app = create_app()
+
+    def post_flask(user_input):
+        flask_app.test_client().post('/whatup', data={'input-integer': user_input})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(post_flask, user_inputs))
+    run_log_writer.flush()
+    flask_seconds = time.perf_counter() - start
+
+    return {'asgi_requests_per_second': request_count / asgi_seconds,
+            'flask_requests_per_second': request_count / flask_seconds}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the ASGI and Flask flavors of simple_api in-process.')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    arguments = parser.parse_args()
+
+    for flavor, requests_per_second in compare_with_flask(arguments.requests, arguments.concurrency).items():
+        print(f'{flavor}: {requests_per_second:.0f}')
@@ -0,0 +1,169 @@
+"""
+A self-contained load test for the /whatup and /get_log endpoints of simple_api.
+
+Requests are sent either through Flask's test client (no network, measures the app and its logging)
+or over HTTP to a local threaded werkzeug server, from a pool of concurrent clients.
+The session is split into checkpoints: each checkpoint sends its share of /whatup requests and then times
+a few /get_log calls, so the report shows how both endpoints behave as the run log grows.
+
+The temp run log is cleared before the session starts.
+
+Run from the python_examples directory:
+    python -m simple_api.benchmark_whatup --mode server --session-length 20000 --concurrency 16 --invalid-ratio 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from . import clear_log_file, create_app, get_log_file_absolute_path, run_log_writer
+
+
+def percentile(sorted_values, fraction):
+    # nearest rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+
+def summarize(latencies, seconds):
+    latencies = sorted(latencies)
+    return {'requests': len(latencies),
+            'requests_per_second': len(latencies) / seconds if seconds else None,
+            'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+            'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+            'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None}
+
+
+class TestClientTarget:
+    """
+    Sends requests through Flask's test client, one client per thread.
+    """
+
+    def __init__(self):
+        self._app = create_app()
+        self._clients = threading.local()
+
+    def _client(self):
+        if not hasattr(self._clients, 'client'):
+            self._clients.client = self._app.test_client()
+        return self._clients.client
+
+    def post_whatup(self, user_input):
+        self._client().post('/whatup', data={'input-integer': user_input}).get_data()
+
+    def get_log(self):
+        self._client().get('/get_log').get_data()
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # one access log line per request would be measured along with the app
+    def log_request(self, *arguments, **keyword_arguments):
+        pass
+
+
+class ServerTarget:
+    """
+    Serves the app with a threaded werkzeug server on a free local port and sends real HTTP requests to it.
+    """
+
+    def __init__(self, host='127.0.0.1'):
+        self._server = make_server(host, 0, create_app(), threaded=True, request_handler=QuietRequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.base_url = f'http://{host}:{self._server.server_port}'
+
+    def post_whatup(self, user_input):
+        body = urlencode({'input-integer': user_input}).encode('utf-8')
+        with urllib.request.urlopen(f'{self.base_url}/whatup', data=body) as response:
+            response.read()
+
+    def get_log(self):
+        with urllib.request.urlopen(f'{self.base_url}/get_log') as response:
+            response.read()
+
+    def close(self):
+        self._server.shutdown()
+
+
+def timed(function, *arguments):
+    start = time.perf_counter()
+    function(*arguments)
+    return time.perf_counter() - start
+
+
+def run_benchmark(target, session_length=10000, checkpoints=5, concurrency=8, invalid_ratio=0.1,
+                  get_log_samples=5, seed=0):
+    """
+    :param target: a TestClientTarget or a ServerTarget.
+    :param session_length: total number of /whatup requests in the session.
+    :param checkpoints: number of equal parts the session is measured in.
+    :param concurrency: number of concurrent clients.
+    :param invalid_ratio: share of /whatup requests with an invalid input.
+    :param get_log_samples: /get_log calls timed at every checkpoint.
+    :param seed: seed of the payload mix.
+    :return: a list with one result dictionary per checkpoint.
+    """
+    random_generator = random.Random(seed)
+    user_inputs = [random_generator.choice(['12a', '', '1.5', 'abc']) if random_generator.random() < invalid_ratio
+                   else str(random_generator.randint(-10 ** 6, 10 ** 6)) for _ in range(session_length)]
+
+    clear_log_file(get_log_file_absolute_path(use_temp=True))
+    results = []
+    per_checkpoint = max(1, session_length // checkpoints)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for start in range(0, session_length, per_checkpoint):
+            checkpoint_inputs = user_inputs[start:start + per_checkpoint]
+
+            checkpoint_start = time.perf_counter()
+            whatup_latencies = list(executor.map(lambda user_input: timed(target.post_whatup, user_input),
+                                                 checkpoint_inputs))
+            whatup_seconds = time.perf_counter() - checkpoint_start
+
+            run_log_writer.flush()
+            get_log_latencies = [timed(target.get_log) for _ in range(get_log_samples)]
+
+            results.append({'log_size': start + len(checkpoint_inputs),
+                            'whatup': summarize(whatup_latencies, whatup_seconds),
+                            'get_log': summarize(get_log_latencies, sum(get_log_latencies))})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['test_client', 'server'], default='test_client')
+    parser.add_argument('--session-length', type=int, default=10000)
+    parser.add_argument('--checkpoints', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--invalid-ratio', type=float, default=0.1)
+    parser.add_argument('--get-log-samples', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON Lines')
+    arguments = parser.parse_args()
+
+    benchmark_target = ServerTarget() if arguments.mode == 'server' else TestClientTarget()
+    try:
+        checkpoint_results = run_benchmark(benchmark_target, session_length=arguments.session_length,
+                                           checkpoints=arguments.checkpoints, concurrency=arguments.concurrency,
+                                           invalid_ratio=arguments.invalid_ratio,
+                                           get_log_samples=arguments.get_log_samples, seed=arguments.seed)
+    finally:
+        benchmark_target.close()
+
+    for checkpoint_result in checkpoint_results:
+        if arguments.json:
+            print(json.dumps(checkpoint_result))
+            continue
+        whatup, get_log = checkpoint_result['whatup'], checkpoint_result['get_log']
+        print(f"log size {checkpoint_result['log_size']:>8} | whatup {whatup['requests_per_second']:8.0f} req/s "
+              f"p50 {whatup['p50_ms']:7.2f} ms p95 {whatup['p95_ms']:7.2f} ms p99 {whatup['p99_ms']:7.2f} ms | "
+              f"get_log p50 {get_log['p50_ms']:8.2f} ms p99 {get_log['p99_ms']:8.2f} ms")
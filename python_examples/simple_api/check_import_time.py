@@ -0,0 +1,52 @@
+"""
+Keeps `import simple_api` cheap. Imports simple_api in a fresh interpreter with -X importtime and fails
+when Flask (or werkzeug) was imported along with it, or when the import took longer than the budget.
+
+Run from the python_examples directory, e.g. in CI:
+    python -m simple_api.check_import_time --budget-ms 50
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+EAGER_IMPORTS_NOT_ALLOWED = ('flask', 'werkzeug', 'jinja2')
+
+
+def measure_import_time(module_name='simple_api'):
+    """
+    :param module_name: module to import in a fresh interpreter.
+    :return: a tuple (cumulative import time of the module in seconds, names of every top level package imported).
+    """
+    python_examples_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed_process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                                       cwd=python_examples_directory, capture_output=True, text=True, check=True)
+
+    cumulative_microseconds = None
+    imported_packages = set()
+    # lines look like "import time:       self [us] |  cumulative | imported package"
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_time, cumulative_time, imported_name = line[len('import time:'):].split('|')
+        if not cumulative_time.strip().isdigit():
+            continue
+        imported_packages.add(imported_name.strip().split('.')[0])
+        if imported_name.strip() == module_name:
+            cumulative_microseconds = int(cumulative_time)
+
+    return cumulative_microseconds / 10 ** 6, imported_packages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check that importing simple_api stays cheap.')
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    arguments = parser.parse_args()
+
+    import_seconds, imported = measure_import_time()
+    eager_imports = sorted(imported.intersection(EAGER_IMPORTS_NOT_ALLOWED))
+    print(f'import simple_api: {import_seconds * 1000:.1f} ms')
+    if eager_imports:
+        sys.exit(f'importing simple_api also imported {", ".join(eager_imports)}, they belong in create_app()')
+    if import_seconds * 1000 > arguments.budget_ms:
+        sys.exit(f'importing simple_api took more than {arguments.budget_ms} ms')
@@ -0,0 +1,231 @@
+"""
+In-process request metrics for simple_api, rendered in the Prometheus text exposition format on /metrics.
+
+Every observation is a dictionary lookup and a few additions under one lock, cheap enough to record on every request.
+Metrics are kept per process. With several workers behind one port (e.g. gunicorn) every scrape lands on a random
+worker, so each process also dumps its metrics to metrics_<pid>.json in a shared directory and /metrics renders the
+sum of every file there. Without a directory /metrics is only correct with a single worker.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def format_labels(labels):
+    escaped_labels = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                      for name, value in labels]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped_labels) + '}'
+
+
+class Histogram:
+    """
+    A Prometheus histogram, observations are counted in their bucket and made cumulative when rendered.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # a value equal to a bucket's upper bound belongs to it, as "le" reads
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_state(self):
+        return {'bucket_counts': list(self.bucket_counts), 'sum': self.sum, 'count': self.count}
+
+    def merge_state(self, state):
+        # histograms of processes configured with other buckets can not be added up
+        if len(state['bucket_counts']) != len(self.bucket_counts):
+            return
+        self.bucket_counts = [bucket_count + other_count
+                              for bucket_count, other_count in zip(self.bucket_counts, state['bucket_counts'])]
+        self.sum += state['sum']
+        self.count += state['count']
+
+    def render(self, name, labels):
+        lines = []
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(self.buckets + ('+Inf',), self.bucket_counts):
+            cumulative_count += bucket_count
+            lines.append(f'{name}_bucket{format_labels(labels + [("le", upper_bound)])} {cumulative_count}')
+        lines.append(f'{name}_sum{format_labels(labels)} {self.sum}')
+        lines.append(f'{name}_count{format_labels(labels)} {self.count}')
+        return lines
+
+
+class RequestMetrics:
+    """
+    Collects the simple_api metrics:
+        - requests by route, method and status, and a latency histogram per route
+        - runs by result, valid or invalid input, for the validation failure rate
+        - a latency histogram per stage: 'whatup_run' (WhatUp.run), 'log_submit' (handing the runs to the
+          RunLogWriter, the logging cost a request waits on) and 'log_write' / 'log_rotate' (the writer thread)
+
+    With a directory, a background thread dumps the process's metrics to directory/metrics_<pid>.json every
+    dump_interval seconds when they changed, and render() adds up every process's file. The files of exited workers
+    are kept so the counters never go back, clear the directory before starting a deployment.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory=None, dump_interval=1.0):
+        self.buckets = buckets
+        self.directory = directory
+        self.dump_interval = dump_interval
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._request_durations = {}
+        self._runs = Counter()
+        self._stage_durations = {}
+
+        # observations counted since the start and at the last dump, a dump is skipped when nothing changed
+        self._changes = 0
+        self._dumped_changes = 0
+        self._dump_lock = threading.Lock()
+        self._dump_thread = None
+
+    def observe_request(self, route, method, status, seconds):
+        with self._lock:
+            self._requests[(route, method, status)] += 1
+            if route not in self._request_durations:
+                self._request_durations[route] = Histogram(self.buckets)
+            self._request_durations[route].observe(seconds)
+            self._changes += 1
+        self._start_dump_thread()
+
+    def observe_runs(self, run_dictionaries):
+        invalid_runs = sum(1 for run_dictionary in run_dictionaries if 'error' in run_dictionary)
+        with self._lock:
+            self._runs['invalid'] += invalid_runs
+            self._runs['valid'] += len(run_dictionaries) - invalid_runs
+            self._changes += 1
+        self._start_dump_thread()
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            if stage not in self._stage_durations:
+                self._stage_durations[stage] = Histogram(self.buckets)
+            self._stage_durations[stage].observe(seconds)
+            self._changes += 1
+        self._start_dump_thread()
+
+    def reset_after_fork(self):
+        # a forked worker reports only its own requests and starts its own dump thread
+        self.__init__(self.buckets, directory=self.directory, dump_interval=self.dump_interval)
+
+    def _start_dump_thread(self):
+        if self.directory is None or self._dump_thread is not None:
+            return
+        with self._dump_lock:
+            if self._dump_thread is None:
+                self._dump_thread = threading.Thread(target=self._dump_periodically, name='request-metrics-dump',
+                                                     daemon=True)
+                self._dump_thread.start()
+                atexit.register(self.dump)
+
+    def _dump_periodically(self):
+        while True:
+            time.sleep(self.dump_interval)
+            self.dump()
+
+    def get_state(self):
+        """
+        :return: the metrics of this process as a JSON serializable dictionary, see merge_state.
+        """
+        with self._lock:
+            return {'requests': [[route, method, status, count]
+                                 for (route, method, status), count in self._requests.items()],
+                    'request_durations': {route: histogram.get_state()
+                                          for route, histogram in self._request_durations.items()},
+                    'runs': dict(self._runs),
+                    'stage_durations': {stage: histogram.get_state()
+                                        for stage, histogram in self._stage_durations.items()}}
+
+    def merge_state(self, state):
+        """
+        Adds the metrics of another process, as returned by its get_state, to these ones.
+        """
+        with self._lock:
+            for route, method, status, count in state['requests']:
+                self._requests[(route, method, status)] += count
+            for durations, merged_durations in ((state['request_durations'], self._request_durations),
+                                                (state['stage_durations'], self._stage_durations)):
+                for name, histogram_state in durations.items():
+                    if name not in merged_durations:
+                        merged_durations[name] = Histogram(self.buckets)
+                    merged_durations[name].merge_state(histogram_state)
+            self._runs.update(state['runs'])
+
+    def dump(self):
+        """
+        Writes the metrics of this process to directory/metrics_<pid>.json if they changed since the last dump.
+        """
+        if self.directory is None:
+            return
+        with self._dump_lock:
+            changes = self._changes
+            if changes == self._dumped_changes:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            metrics_path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+            # written aside and renamed, so a render never reads half a file
+            with open(metrics_path + '.tmp', 'w', encoding='utf-8') as metrics_file:
+                json.dump(self.get_state(), metrics_file)
+            os.replace(metrics_path + '.tmp', metrics_path)
+            self._dumped_changes = changes
+
+    def render(self):
+        """
+        :return: every metric in the Prometheus text exposition format, summed over every process's file
+                 of the directory if there is one.
+        """
+        if self.directory is None:
+            return self.render_this_process()
+
+        self.dump()
+        merged_metrics = RequestMetrics(self.buckets)
+        for metrics_path in sorted(glob.glob(os.path.join(self.directory, 'metrics_*.json'))):
+            try:
+                with open(metrics_path, 'r', encoding='utf-8') as metrics_file:
+                    merged_metrics.merge_state(json.load(metrics_file))
+            except (FileNotFoundError, json.decoder.JSONDecodeError):
+                continue
+        return merged_metrics.render_this_process()
+
+    def render_this_process(self):
+        """
+        :return: the metrics observed by this process in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = ['# HELP simple_api_requests_total Requests handled, by route, method and status.',
+                     '# TYPE simple_api_requests_total counter']
+            for (route, method, status), count in sorted(self._requests.items()):
+                labels = [('route', route), ('method', method), ('status', status)]
+                lines.append(f'simple_api_requests_total{format_labels(labels)} {count}')
+
+            lines += ['# HELP simple_api_request_duration_seconds Time to handle a request, by route.',
+                      '# TYPE simple_api_request_duration_seconds histogram']
+            for route, histogram in sorted(self._request_durations.items()):
+                lines += histogram.render('simple_api_request_duration_seconds', [('route', route)])
+
+            lines += ['# HELP simple_api_runs_total WhatUp runs, by result of the input validation.',
+                      '# TYPE simple_api_runs_total counter']
+            for result in ('valid', 'invalid'):
+                lines.append(f'simple_api_runs_total{format_labels([("result", result)])} {self._runs[result]}')
+
+            lines += ['# HELP simple_api_stage_duration_seconds Time spent in each stage of a run and its logging.',
+                      '# TYPE simple_api_stage_duration_seconds histogram']
+            for stage, histogram in sorted(self._stage_durations.items()):
+                lines += histogram.render('simple_api_stage_duration_seconds', [('stage', stage)])
+
+        return '\n'.join(lines) + '\n'